@@ -1,8 +1,26 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import json
-from datetime import datetime
+import csv
+from datetime import datetime, date, timedelta
 import os
+import sys
+import heapq
+import itertools
+import bisect
+import re
+import io
+import multiprocessing
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import time
+import threading
+import queue
+import random
+import tempfile
+import shutil
+import difflib
 import jdatetime  # برای کار با تاریخ شمسی
 
 # برای Excel
@@ -30,12 +48,21 @@ except ImportError:
     PDF_AVAILABLE = False
     print("ReportLab not installed. PDF export disabled.")
 
+# برای ادغام صفحات PDF تولیدشده به صورت موازی (اختیاری)
+try:
+    from pypdf import PdfReader, PdfWriter
+
+    PDF_MERGE_AVAILABLE = True
+except ImportError:
+    PDF_MERGE_AVAILABLE = False
+
 # ---------- تنظیمات فونت فارسی برای PDF و UI (مهم) ----------
 # نام فونت فارسی برای UI Tkinter و PDF
 GLOBAL_FONT_NAME = "Tanha"  # مطمئن شوید فایل Tanha.ttf در کنار برنامه هست
 GLOBAL_FONT_SIZE = 10  # اندازه فونت کلی
 PDF_FONT_PATH = "Tanha.ttf"
 PDF_FONT_NAME = "Tanha"
+PDF_FONT_WARNING = True  # سنجش رابط کاربری (--bench-ui) پنجره هشدار مودال فونت را خاموش می‌کند
 
 
 def register_persian_font_for_pdf():
@@ -44,6 +71,8 @@ def register_persian_font_for_pdf():
         return
 
     if not os.path.exists(PDF_FONT_PATH):
+        if not PDF_FONT_WARNING:
+            return
         messagebox.showwarning("هشدار فونت PDF",
                                f"فایل فونت PDF ({PDF_FONT_PATH}) یافت نشد. "
                                "لطفاً آن را دانلود کرده و در کنار برنامه قرار دهید."
@@ -59,28 +88,74 @@ def register_persian_font_for_pdf():
 
 
 # ---------- توابع تبدیل تاریخ شمسی/میلادی ----------
-def parse_shamsi_date(sh_date_str):
+# کدگذار سریع تاریخ شمسی با محاسبات صحیح (سازگار با الگوریتم jdatetime/jalali_core)
+JALALI_MONTH_OFFSETS = (0, 31, 62, 93, 124, 155, 186, 216, 246, 276, 306, 336)
+JALALI_LEAP_REMAINDERS = frozenset((1, 5, 9, 13, 17, 22, 26, 30))  # سال کبیسه: year % 33
+JALALI_MAX_YEAR = 9377  # jdatetime.MAXYEAR
+JALALI_EPOCH_ORDINAL = date(1600, 1, 1).toordinal() + 79  # ordinal روز ۹۷۹/۰۱/۰۱
+PERSIAN_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "0123456789" * 2)
+
+
+def jalali_to_ordinal(sh_date_str):
     """
-    تبدیل رشته تاریخ شمسی (YYYY/MM/DD) به شیء jdatetime.date.
-    در صورت عدم موفقیت None برمی‌گرداند.
+    تبدیل رشته تاریخ شمسی (YYYY/MM/DD، با ارقام لاتین یا فارسی) به شماره روز (ordinal میلادی).
+    فقط با تقسیم رشته و محاسبات صحیح؛ در صورت نامعتبر بودن None برمی‌گرداند.
     """
-    try:
-        if not sh_date_str:
+    if not sh_date_str:
+        return None
+    if not sh_date_str.isascii():
+        sh_date_str = sh_date_str.translate(PERSIAN_DIGITS)
+        if not sh_date_str.isascii():
             return None
-        return jdatetime.datetime.strptime(sh_date_str, '%Y/%m/%d').date()
-    except ValueError:
+    parts = sh_date_str.split("/")
+    if len(parts) != 3:
         return None
+    ys, ms, ds = parts
+    if len(ys) != 4 or not 0 < len(ms) < 3 or not 0 < len(ds) < 3 or not (ys + ms + ds).isdigit():
+        return None
+
+    y, m, d = int(ys), int(ms), int(ds)
+    if not 1 <= y <= JALALI_MAX_YEAR or not 1 <= m <= 12 or d < 1:
+        return None
+    if m <= 6:
+        month_days = 31
+    elif m <= 11:
+        month_days = 30
+    else:
+        month_days = 30 if y % 33 in JALALI_LEAP_REMAINDERS else 29
+    if d > month_days:
+        return None
+
+    jy = y - 979
+    return (JALALI_EPOCH_ORDINAL + 365 * jy + (jy // 33) * 8 + (jy % 33 + 3) // 4
+            + JALALI_MONTH_OFFSETS[m - 1] + d - 1)
 
 
-def shamsi_to_gregorian_datetime(sh_date_str):
+def ordinal_to_jalali(day):
+    """تبدیل شماره روز (ordinal میلادی) به سه‌تایی (سال، ماه، روز) شمسی."""
+    days = day - JALALI_EPOCH_ORDINAL
+    cycles, days = divmod(days, 12053)  # 12053 روز = ۳۳ سال
+    year = 979 + 33 * cycles + 4 * (days // 1461)
+    days %= 1461
+    if days >= 366:
+        days -= 1
+        year += days // 365
+        days %= 365
+    if days < 186:
+        return year, days // 31 + 1, days % 31 + 1
+    days -= 186
+    return year, days // 30 + 7, days % 30 + 1
+
+
+def parse_shamsi_date(sh_date_str):
     """
-    تبدیل رشته تاریخ شمسی به شیء datetime میلادی.
+    تبدیل رشته تاریخ شمسی (YYYY/MM/DD) به شیء jdatetime.date.
     در صورت عدم موفقیت None برمی‌گرداند.
     """
-    jdate = parse_shamsi_date(sh_date_str)
-    if jdate:
-        return jdate.togregorian()
-    return None
+    day = jalali_to_ordinal(sh_date_str)
+    if day is None:
+        return None
+    return jdatetime.date(*ordinal_to_jalali(day))
 
 
 def gregorian_datetime_to_shamsi_str(dt_obj):
@@ -89,8 +164,80 @@ def gregorian_datetime_to_shamsi_str(dt_obj):
     """
     if not dt_obj:
         return ""
-    jdate = jdatetime.date.fromgregorian(date=dt_obj)
-    return jdate.strftime('%Y/%m/%d')
+    return ordinal_to_shamsi_str(dt_obj.toordinal())
+
+
+def shamsi_to_ordinal(sh_date_str):
+    """
+    تبدیل رشته تاریخ شمسی به شماره روز (ordinal میلادی) برای مقایسه سریع.
+    در صورت عدم موفقیت None برمی‌گرداند.
+    """
+    return jalali_to_ordinal(sh_date_str)
+
+
+def ordinal_to_shamsi_str(day):
+    """تبدیل شماره روز (ordinal میلادی) به رشته تاریخ شمسی (YYYY/MM/DD)."""
+    year, month, day_of_month = ordinal_to_jalali(day)
+    return f"{year:04d}/{month:02d}/{day_of_month:02d}"
+
+
+def check_jalali_codec(first_year=1000, last_year=1999, bench_count=200000, out=None):
+    """
+    مقایسه کدگذار سریع با jdatetime برای همه روزهای بازه سال‌ها و ورودی‌های نامعتبر،
+    و اندازه‌گیری هزینه هر تبدیل (قدیم: strptime، جدید: jalali_to_ordinal).
+    تعداد ناسازگاری‌ها را برمی‌گرداند.
+    """
+    out = out or sys.stdout
+    mismatches = 0
+
+    def report(text):
+        nonlocal mismatches
+        mismatches += 1
+        if mismatches <= 20:
+            print(text, file=out)
+
+    day = jdatetime.date(first_year, 1, 1).togregorian().toordinal()
+    last = jdatetime.date(last_year, 12, 29).togregorian().toordinal()
+    checked = 0
+    while day <= last:
+        jd = jdatetime.date.fromgregorian(date=date.fromordinal(day))
+        text = jd.strftime('%Y/%m/%d')
+        if ordinal_to_jalali(day) != (jd.year, jd.month, jd.day):
+            report(f"ordinal_to_jalali({day}) != {text}")
+        if jalali_to_ordinal(text) != day or jalali_to_ordinal(text.translate(
+                str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹"))) != day:
+            report(f"jalali_to_ordinal({text}) != {day}")
+        day += 1
+        checked += 1
+
+    invalid_samples = [f"{y}/12/30" for y in range(first_year, last_year + 1)] + [
+        "", "1402", "1402/01", "1402/13/01", "1402/00/10", "1402/01/00", "1402/07/31",
+        "1402/1/5", "1402/01/001", "14020/01/01", "1402-01-01", " 1402/01/01", "1402/01/01 ",
+        "+402/01/01", "1402/+1/01", "۱۴۰۲/۱۲/۳۰", "١٤٠٣/١٢/٣٠", "1402/ab/01",
+    ]
+    for text in invalid_samples:
+        try:
+            expected = jdatetime.datetime.strptime(text, '%Y/%m/%d').date().togregorian().toordinal()
+        except ValueError:
+            expected = None
+        if jalali_to_ordinal(text) != expected:
+            report(f"jalali_to_ordinal({text!r}) != {expected}")
+        checked += 1
+
+    samples = [ordinal_to_shamsi_str(day) for day in range(last - bench_count, last)]
+    start = time.perf_counter()
+    for text in samples:
+        jdatetime.datetime.strptime(text, '%Y/%m/%d').date().togregorian().toordinal()
+    old_cost = (time.perf_counter() - start) / len(samples)
+    start = time.perf_counter()
+    for text in samples:
+        jalali_to_ordinal(text)
+    new_cost = (time.perf_counter() - start) / len(samples)
+
+    print(f"{checked} تاریخ بررسی شد، {mismatches} ناسازگاری.", file=out)
+    print(f"strptime: {old_cost * 1e6:.2f} µs/date, jalali_to_ordinal: {new_cost * 1e6:.2f} µs/date "
+          f"({old_cost / new_cost:.1f}x)", file=out)
+    return mismatches
 
 
 # ---------- ذخیره و بارگذاری داده‌ها و تنظیمات ----------
@@ -98,22 +245,37 @@ DATA_FILE = "projects_data.json"
 CONFIG_FILE = "config.json"
 
 
-def save_data(data):
+def write_data_file(data, path=DATA_FILE):
+    """
+    نوشتن داده‌ها در فایل JSON بدون پیام رابط کاربری (خطا به فراخواننده می‌رسد).
+    ابتدا در فایل موقت نوشته و سپس جایگزین می‌شود تا قطع برنامه فایل را نیمه‌کاره نگذارد.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_data_file(path=DATA_FILE):
+    """خواندن داده‌ها از فایل JSON بدون پیام رابط کاربری (قابل اجرا در نخ پس‌زمینه)"""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_data(data, path=DATA_FILE):
     """ذخیره داده‌ها در فایل JSON"""
     try:
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        write_data_file(data, path)
     except Exception as e:
         messagebox.showerror("خطا", f"خطا در ذخیره داده‌ها: {str(e)}")
 
 
-def load_data():
+def load_data(path=DATA_FILE):
     """بارگذاری داده‌ها از فایل JSON"""
     try:
-        if not os.path.exists(DATA_FILE):
-            return []
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return read_data_file(path)
     except Exception as e:
         messagebox.showerror("خطا", f"خطا در بارگذاری داده‌ها: {str(e)}")
         return []
@@ -140,6 +302,246 @@ def load_config():
         return {"theme": "light"}
 
 
+# ---------- بایگانی پروژه‌های تمام شده (داده‌های سرد) ----------
+ARCHIVE_DIR = "archive"
+ARCHIVE_AFTER_DAYS = 30  # پروژه‌های تمام شده پس از این مدت از مجموعه کاری خارج می‌شوند
+
+
+def is_archivable(rec, today=None):
+    """آیا پروژه تمام شده است و تاریخ پایانش از مهلت بایگانی گذشته است؟"""
+    if rec.get("status", "") not in FINISHED_STATUSES:
+        return False
+    end_day = shamsi_to_ordinal(rec.get("end_date", ""))
+    if end_day is None:
+        return False
+    today = today if today is not None else date.today().toordinal()
+    return end_day <= today - ARCHIVE_AFTER_DAYS
+
+
+def archive_year(rec):
+    """سال شمسی تاریخ پایان با ارقام لاتین (نام فایل بایگانی)؛ «۱۴۰۰/..» و «1400/..» یک سال هستند."""
+    end_day = jalali_to_ordinal(rec.get("end_date", ""))
+    if end_day is None:
+        return rec.get("end_date", "")[:4]
+    return f"{ordinal_to_jalali(end_day)[0]:04d}"
+
+
+class ArchiveStore:
+    """
+    بایگانی پروژه‌های تمام شده در فایل‌های جداگانه برای هر سال شمسی (سال تاریخ پایان).
+    فایل‌ها فقط در صورت درخواست و یکی‌یکی خوانده می‌شوند.
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR, descriptions=None):
+        self.directory = directory
+        self.descriptions = descriptions  # فایل توضیحات مجموعه داده (پیش‌فرض: مجموعه فعال)
+
+    def _path(self, year):
+        return os.path.join(self.directory, f"projects_{year}.json")
+
+    def years(self):
+        """سال‌هایی که فایل بایگانی دارند (به ترتیب)."""
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for filename in os.listdir(self.directory):
+            match = re.fullmatch(r"projects_(\d{4})\.json", filename)
+            if match:
+                found.append(match.group(1))
+        return sorted(found)
+
+    def load_year(self, year):
+        path = self._path(year)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_year(self, year, records):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(year)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def iter_records(self):
+        """پیمایش رکوردهای بایگانی، هر بار فقط یک فایل سال در حافظه."""
+        for year in self.years():
+            yield from self.load_year(year)
+
+    def archive(self, records):
+        """
+        افزودن رکوردها به فایل سال مربوطه. رکوردی که عیناً در فایل هست دوباره اضافه نمی‌شود،
+        ولی رکوردهای متفاوت با کلید (name, address) یکسان همه نگه داشته می‌شوند.
+        """
+        by_year = {}
+        for rec in records:
+            inline_description(rec, self.descriptions)
+            by_year.setdefault(archive_year(rec), []).append(rec)
+        for year, new_records in by_year.items():
+            existing = self.load_year(year)
+            unmatched = list(existing)  # هر رکورد موجود فقط با یک رکورد جدید یکسان شمرده می‌شود
+            for rec in new_records:
+                if rec in unmatched:
+                    unmatched.remove(rec)
+                else:
+                    existing.append(rec)
+            self._write_year(year, existing)
+
+    def find(self, key):
+        """جستجوی یک رکورد در بایگانی با کلید (name, address)."""
+        for rec in self.iter_records():
+            if record_key(rec) == key:
+                return rec
+        return None
+
+    def remove(self, key, year=None, payload=None):
+        """
+        حذف اولین رکورد با کلید key (یا در صورت ارسال payload، رکورد برابر با آن) از بایگانی
+        برای بازگرداندن یا حذف؛ رکورد حذف‌شده یا None. رکوردهای دیگر با همان کلید می‌مانند.
+        """
+        for y in ([year] if year else self.years()):
+            records = self.load_year(y)
+            for i, rec in enumerate(records):
+                if record_key(rec) == key and (payload is None or rec == payload):
+                    del records[i]
+                    self._write_year(y, records)
+                    return rec
+        return None
+
+
+def archive_finished(records, store, path=DATA_FILE):
+    """انتقال پروژه‌های قابل بایگانی به بایگانی؛ مجموعه کاری (داغ) و تعداد منتقل‌شده را برمی‌گرداند."""
+    today = date.today().toordinal()
+    hot = []
+    cold = []
+    for rec in records:
+        (cold if is_archivable(rec, today) else hot).append(rec)
+    if cold:
+        # ابتدا بایگانی نوشته می‌شود تا در صورت قطع برنامه داده‌ای از دست نرود
+        try:
+            store.archive(cold)
+            write_data_file(hot, path)
+        except OSError as e:
+            print(f"Error archiving finished projects: {e}")
+            return records, 0
+    return hot, len(cold)
+
+
+# ---------- ذخیره توضیحات طولانی خارج از رکورد ----------
+DESCRIPTION_BLOB_FILE = "descriptions.blob"
+DESCRIPTION_INLINE_LIMIT = 200  # توضیحات کوتاه‌تر از این داخل خود رکورد می‌مانند
+DESCRIPTION_PREVIEW_CHARS = 50
+
+
+class BlobStore:
+    """
+    فایل فقط-افزودنی برای متن‌های طولانی. هر متن با یک مرجع [offset, length]
+    (بر حسب بایت UTF-8) در رکورد شناخته می‌شود و فقط هنگام نیاز خوانده می‌شود.
+    ویرایش یک متن، نسخه جدید را به انتهای فایل اضافه می‌کند و نسخه قبلی دست نمی‌خورد.
+    """
+
+    def __init__(self, path=DESCRIPTION_BLOB_FILE):
+        self.path = path
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def append(self, text):
+        data = text.encode("utf-8")
+        with self._lock:
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(data)
+        return [offset, len(data)]
+
+    def read(self, ref):
+        offset, length = ref
+        with self._lock:
+            if self._reader is None:
+                self._reader = open(self.path, "rb")
+            self._reader.seek(offset)
+            data = self._reader.read(length)
+        return data.decode("utf-8")
+
+    def close(self):
+        with self._lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+
+DESCRIPTIONS = BlobStore()  # فایل توضیحات مجموعه داده فعال (در نخ اصلی عوض می‌شود)
+
+
+def set_active_descriptions(store):
+    """تعیین فایل توضیحات مجموعه داده فعال برای کدهایی که فایل را صریحاً نمی‌گیرند."""
+    global DESCRIPTIONS
+    DESCRIPTIONS = store
+
+
+def load_description(rec, store=None):
+    """متن کامل توضیحات؛ در صورت نیاز از فایل توضیحات خوانده می‌شود."""
+    ref = rec.get("description_ref")
+    if ref is None:
+        return rec.get("description", "")
+    try:
+        return (store or DESCRIPTIONS).read(ref)
+    except (OSError, ValueError) as e:
+        print(f"Error reading description: {e}")
+        return rec.get("description_preview", "")
+
+
+def description_preview(rec):
+    """متن کوتاه توضیحات برای ستون جدول، بدون خواندن فایل توضیحات."""
+    if "description_ref" in rec:
+        return rec.get("description_preview", "") + "..."
+    description = rec.get("description", "")
+    if len(description) > DESCRIPTION_PREVIEW_CHARS:
+        return description[:DESCRIPTION_PREVIEW_CHARS] + "..."
+    return description
+
+
+def externalize_description(rec, store=None):
+    """
+    انتقال توضیحات طولانیِ داخل رکورد به فایل توضیحات. اگر توضیحات جدید کوتاه باشد
+    مرجع قبلی حذف می‌شود. در صورت تغییر رکورد True برمی‌گرداند.
+    """
+    if "description" not in rec:
+        return False
+    description = rec["description"]
+    if len(description) > DESCRIPTION_INLINE_LIMIT:
+        rec["description_ref"] = (store or DESCRIPTIONS).append(description)
+        rec["description_preview"] = description[:DESCRIPTION_PREVIEW_CHARS]
+        del rec["description"]
+        return True
+    if "description_ref" in rec:
+        del rec["description_ref"]
+        rec.pop("description_preview", None)
+        return True
+    return False
+
+
+def inline_description(rec, store=None):
+    """بازگرداندن توضیحات به داخل رکورد (مثلاً پیش از بایگانی، تا فایل سال مستقل باشد)."""
+    if "description_ref" in rec:
+        rec["description"] = load_description(rec, store)
+        del rec["description_ref"]
+        rec.pop("description_preview", None)
+
+
+def portable_record(rec, store=None):
+    """
+    کپی رکورد با توضیحات کامل به جای مرجع فایل توضیحات (خود رکورد اگر مرجعی نداشته باشد)،
+    برای پشتیبان‌ها و پردازه‌های کارگر که فایل توضیحات مجموعه داده را نمی‌شناسند.
+    """
+    if "description_ref" not in rec:
+        return rec
+    portable = {k: v for k, v in rec.items() if k not in ("description_ref", "description_preview")}
+    portable["description"] = load_description(rec, store)
+    return portable
+
+
 # ---------- تعیین وضعیت ----------
 def determine_status(next_call_date_str, finished):
     """تعیین وضعیت پروژه بر اساس تاریخ تماس بعدی"""
@@ -149,8 +551,8 @@ def determine_status(next_call_date_str, finished):
     if not next_call_date_str:
         return "انتظار"
 
-    dt_today = datetime.now().date()
-    dt_next_call = shamsi_to_gregorian_datetime(next_call_date_str)
+    dt_today = datetime.now().toordinal()
+    dt_next_call = jalali_to_ordinal(next_call_date_str)
 
     if dt_next_call is None:
         return "انتظار"
@@ -160,6 +562,1293 @@ def determine_status(next_call_date_str, finished):
         return "در انتظار تماس مجدد"
 
 
+def record_key(rec):
+    """کلید یکتای هر رکورد: (نام مهندس، آدرس)"""
+    return rec.get("name", ""), rec.get("address", "")
+
+
+# ---------- یادآوری تماس‌ها ----------
+FINISHED_STATUSES = ("از دست رفته", "خرید")
+STATUS_TAGS = {
+    "از دست رفته": "tag_red",
+    "خرید": "tag_green",
+    "انتظار": "tag_yellow",
+    "در انتظار تماس مجدد": "tag_blue",
+}
+REMINDER_MAX_WAIT_MS = 60 * 60 * 1000  # حداکثر فاصله بین دو بررسی تایمر (برای خواب سیستم/تغییر ساعت)
+
+
+class ReminderQueue:
+    """
+    صف اولویت (heap) تماس‌های آینده بر اساس تاریخ تماس بعدی.
+    درج، حذف، تعویق و تغییر تاریخ در O(log n) انجام می‌شود؛
+    ورودی‌های حذف‌شده به صورت تنبل (lazy) از بالای heap دور ریخته می‌شوند.
+    ورودی‌ها با هویت رکورد (id) شناخته می‌شوند تا رکوردهای تکراری با کلید یکسان یادآوری یکدیگر را پاک نکنند.
+    """
+
+    def __init__(self, records=()):
+        self._heap = []
+        self._entries = {}  # id(rec) -> [day, seq, id(rec), rec]
+        self._counter = itertools.count()
+        self.build(records)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _day_for(rec):
+        """شماره روز تماس بعدی برای رکوردهای باز؛ برای رکوردهای تمام شده None."""
+        if rec.get("status", "") in FINISHED_STATUSES:
+            return None
+        return shamsi_to_ordinal(rec.get("next_call_date", ""))
+
+    def build(self, records):
+        """ساخت کامل صف از روی لیست رکوردها در O(n)."""
+        self._heap = []
+        self._entries = {}
+        for rec in records:
+            day = self._day_for(rec)
+            if day is None:
+                continue
+            key = id(rec)
+            old = self._entries.get(key)
+            if old is not None:
+                old[2] = None
+            entry = [day, next(self._counter), key, rec]
+            self._entries[key] = entry
+            self._heap.append(entry)
+        heapq.heapify(self._heap)
+
+    def update(self, rec, day=None):
+        """درج یا بروزرسانی رکورد در صف؛ day در صورت ارسال، تاریخ تعیین‌شده را بازنویسی می‌کند."""
+        key = id(rec)
+        self.remove(rec)
+        if day is None:
+            day = self._day_for(rec)
+        if day is None:
+            return
+        entry = [day, next(self._counter), key, rec]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+
+    def remove(self, rec):
+        """حذف رکورد از صف (علامت‌گذاری تنبل)."""
+        entry = self._entries.pop(id(rec), None)
+        if entry is not None:
+            entry[2] = None
+
+    def snooze(self, rec, days, today=None):
+        """تعویق یادآوری رکورد به اندازه days روز بدون تغییر در داده‌ها."""
+        today = today if today is not None else date.today().toordinal()
+        self.update(rec, day=today + days)
+
+    def reschedule(self, rec, new_date_str):
+        """تغییر تاریخ تماس بعدی رکورد و بروزرسانی صف؛ ذخیره داده‌ها بر عهده فراخواننده است."""
+        rec["next_call_date"] = new_date_str
+        if rec.get("status", "") not in FINISHED_STATUSES:
+            rec["status"] = determine_status(new_date_str, False)
+        self.update(rec)
+
+    def _discard_removed(self):
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
+
+    def peek_day(self):
+        """نزدیک‌ترین روز تماس در صف یا None."""
+        self._discard_removed()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, today=None):
+        """برداشتن همه رکوردهایی که موعد تماسشان رسیده است (به ترتیب تاریخ)."""
+        today = today if today is not None else date.today().toordinal()
+        due = []
+        while True:
+            self._discard_removed()
+            if not self._heap or self._heap[0][0] > today:
+                break
+            day, _, key, rec = heapq.heappop(self._heap)
+            del self._entries[key]
+            due.append(rec)
+        return due
+
+    def due(self, today=None):
+        """
+        لیست رکوردهای سررسید بدون تغییر صف.
+        فقط شاخه‌هایی از heap پیمایش می‌شوند که روزشان <= today است (O(k)).
+        """
+        today = today if today is not None else date.today().toordinal()
+        found = []
+        stack = [0] if self._heap else []
+        while stack:
+            i = stack.pop()
+            entry = self._heap[i]
+            if entry[0] > today:
+                continue
+            if entry[2] is not None:
+                found.append(entry)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self._heap):
+                    stack.append(child)
+        found.sort()
+        return [entry[3] for entry in found]
+
+
+def group_by_engineer(records):
+    """گروه‌بندی رکوردها بر اساس نام مهندس (با حفظ ترتیب ورودی)."""
+    groups = {}
+    for rec in records:
+        groups.setdefault(rec.get("name", ""), []).append(rec)
+    return groups
+
+
+def print_due_report(today=None, out=None, path=None):
+    """چاپ لیست تماس‌های سررسید امروز بدون رابط گرافیکی (برای اجرای زمان‌بندی‌شده/cron)."""
+    out = out or sys.stdout
+    try:
+        records = read_data_file(path or load_config().get("workspace", DATA_FILE))
+    except Exception as e:
+        print(f"Error loading data: {e}", file=sys.stderr)
+        return 1
+
+    due = ReminderQueue(records).due(today)
+    if not due:
+        print("هیچ تماس سررسیدی وجود ندارد.", file=out)
+        return 0
+
+    for name, recs in group_by_engineer(due).items():
+        print(f"{name} ({len(recs)})", file=out)
+        for rec in recs:
+            print(f"    {rec.get('next_call_date', '')}  {rec.get('address', '')}", file=out)
+    return 0
+
+
+# ---------- نرمال‌سازی متن فارسی و جستجو ----------
+PERSIAN_CHAR_MAP = str.maketrans({
+    "ي": "ی", "ى": "ی", "ئ": "ی",
+    "ك": "ک",
+    "ة": "ه", "ۀ": "ه",
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ؤ": "و",
+    "\u200c": " ", "\u200d": "", "\u200e": "", "\u200f": "", "\u0640": "",  # نیم‌فاصله، کشیده و نویسه‌های جهت
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # ارقام فارسی
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # ارقام عربی
+    **{chr(c): "" for c in range(0x064B, 0x0653)},  # اعراب
+})
+
+
+def normalize_persian(text):
+    """یکسان‌سازی ی/ک عربی، نیم‌فاصله، اعراب و ارقام فارسی؛ فاصله‌های تکراری حذف می‌شوند."""
+    return " ".join(str(text).translate(PERSIAN_CHAR_MAP).lower().split())
+
+
+def normalize_for_search(text):
+    """شکل فشرده متن برای جستجو: نرمال‌شده و بدون فاصله (نیم‌فاصله و فاصله یکسان می‌شوند)."""
+    return normalize_persian(text).replace(" ", "")
+
+
+class SearchIndex:
+    """
+    ایندکس سه‌حرفی (trigram) روی نام مهندس و آدرس.
+    جستجو با اشتراک لیست‌های ایندکس، فقط رکوردهای کاندید را بررسی می‌کند
+    و نتایج را به ترتیب ارتباط برمی‌گرداند.
+    """
+
+    FIELDS = ("name", "address")
+
+    def __init__(self, records=()):
+        self._postings = {}  # trigram -> set(id رکورد)
+        self._texts = {}  # id رکورد -> (نام نرمال، آدرس نرمال)
+        self._records = {}  # id رکورد -> رکورد
+        for rec in records:
+            self.add(rec)
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def add(self, rec):
+        """افزودن یا بروزرسانی یک رکورد در ایندکس."""
+        self.remove(rec)
+        texts = tuple(normalize_for_search(rec.get(field, "")) for field in self.FIELDS)
+        rec_id = id(rec)
+        self._texts[rec_id] = texts
+        self._records[rec_id] = rec
+        for text in texts:
+            for gram in self._trigrams(text):
+                self._postings.setdefault(gram, set()).add(rec_id)
+
+    def remove(self, rec):
+        """حذف رکورد از ایندکس."""
+        rec_id = id(rec)
+        texts = self._texts.pop(rec_id, None)
+        if texts is None:
+            return
+        del self._records[rec_id]
+        for text in texts:
+            for gram in self._trigrams(text):
+                posting = self._postings.get(gram)
+                if posting is not None:
+                    posting.discard(rec_id)
+                    if not posting:
+                        del self._postings[gram]
+
+    def search(self, query):
+        """
+        رکوردهایی که نام یا آدرسشان شامل query است، به ترتیب ارتباط:
+        شروع نام، شامل نام، شروع آدرس، شامل آدرس؛ سپس متن کوتاه‌تر.
+        """
+        query = normalize_for_search(query)
+        if not query:
+            return list(self._records.values())
+
+        grams = self._trigrams(query)
+        if grams:
+            postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+        else:
+            candidates = self._texts.keys()  # پرس‌وجوی یک یا دو حرفی
+
+        ranked = []
+        for rec_id in candidates:
+            score = search_score(query, *self._texts[rec_id])
+            if score is not None:
+                ranked.append((score, rec_id))
+        ranked.sort()
+        return [self._records[rec_id] for _, rec_id in ranked]
+
+
+def search_score(query, name, address):
+    """امتیاز ارتباط (کمتر = مرتبط‌تر) برای متن‌های نرمال‌شده؛ در صورت عدم تطابق None."""
+    if name.startswith(query):
+        return 0, len(name)
+    if query in name:
+        return 1, len(name)
+    if address.startswith(query):
+        return 2, len(address)
+    if query in address:
+        return 3, len(address)
+    return None
+
+
+def rank_records(query, records):
+    """جستجوی خطی با همان امتیازدهی SearchIndex (برای رکوردهای خارج از ایندکس مثل بایگانی)."""
+    query = normalize_for_search(query)
+    ranked = []
+    for position, rec in enumerate(records):
+        score = search_score(query, normalize_for_search(rec.get("name", "")),
+                             normalize_for_search(rec.get("address", "")))
+        if score is not None:
+            ranked.append((score, position, rec))
+    ranked.sort(key=lambda item: item[:2])
+    return [rec for _, _, rec in ranked]
+
+
+# ---------- تشخیص و ادغام رکوردهای تکراری ----------
+ADDRESS_STOPWORDS = frozenset(normalize_persian(word) for word in (
+    "خیابان", "خ", "کوچه", "ک", "بلوار", "میدان", "م", "پلاک", "پ", "کوی", "بن", "بست", "بنبست",
+    "نبش", "جنب", "روبروی", "طبقه", "ط", "واحد", "شماره",
+))
+DEDUPE_THRESHOLD = 0.85
+DEDUPE_MAX_BLOCK = 200  # بلوک‌های بزرگ‌تر (توکن‌های بسیار رایج) مقایسه زوجی نمی‌شوند
+MERGE_FIELDS = ("area", "rooms", "visit_date", "next_call_date")  # وضعیت و تاریخ پایان با هم ادغام می‌شوند
+
+
+def address_tokens(address):
+    """توکن‌های معنی‌دار آدرس: حروف و ارقام جدا، بدون واژه‌های عمومی مثل «خیابان» و «پلاک»."""
+    return [token for token in re.findall(r"\d+|[^\W\d_]+", normalize_persian(address))
+            if token not in ADDRESS_STOPWORDS]
+
+
+def address_similarity(tokens_a, tokens_b):
+    """امتیاز شباهت دو آدرس توکن‌شده (۰ تا ۱)؛ ارقام متفاوت (مثلاً پلاک دیگر) یعنی آدرس دیگر."""
+    digits_a = {token for token in tokens_a if token.isdigit()}
+    digits_b = {token for token in tokens_b if token.isdigit()}
+    if digits_a and digits_b and digits_a != digits_b:
+        return 0.0
+    set_a, set_b = set(tokens_a), set(tokens_b)
+    if not set_a or not set_b:
+        return 1.0 if set_a == set_b else 0.0
+    common = len(set_a & set_b)
+    # «خیابان فرهنگ» و «فرهنگ» پس از حذف واژه‌های عمومی شامل یکدیگرند
+    score = max(common / len(set_a | set_b), 0.95 * common / min(len(set_a), len(set_b)))
+    if score < DEDUPE_THRESHOLD:
+        # غلط تایپی یا فاصله متفاوت («شهیدبهشتی» / «شهید بهشتی»)
+        matcher = difflib.SequenceMatcher(None, "".join(tokens_a), "".join(tokens_b))
+        if matcher.quick_ratio() >= DEDUPE_THRESHOLD:
+            score = max(score, matcher.ratio())
+    return score
+
+
+def keeper_rank(rec):
+    """رکوردی که در ادغام نگه داشته می‌شود: جدیدترین ویزیت، سپس کامل‌ترین."""
+    filled = sum(1 for field in MERGE_FIELDS if rec.get(field))
+    return shamsi_to_ordinal(rec.get("visit_date", "")) or 0, filled
+
+
+def find_duplicate_clusters(records):
+    """
+    خوشه‌های رکوردهای احتمالاً تکراری. هر رکورد در چند بلوک قرار می‌گیرد (نام نرمال‌شده
+    همراه با هر توکن آدرس و شکل فشرده آدرس) و فقط رکوردهای یک بلوک با هم مقایسه می‌شوند،
+    نه همه زوج‌ها. هر خوشه لیستی از رکوردهاست که اولی نگه داشته می‌شود.
+    """
+    records = list(records)
+    tokens = [address_tokens(rec.get("address", "")) for rec in records]
+    blocks = {}
+    for i, rec in enumerate(records):
+        name = normalize_for_search(rec.get("name", ""))
+        for key in set(tokens[i]) | {"".join(tokens[i])}:
+            blocks.setdefault((name, key), []).append(i)
+
+    parent = list(range(len(records)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    compared = set()
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > DEDUPE_MAX_BLOCK:
+            continue
+        for position, a in enumerate(members):
+            for b in members[position + 1:]:
+                if (a, b) in compared:
+                    continue
+                compared.add((a, b))
+                root_a, root_b = find(a), find(b)
+                if root_a != root_b and address_similarity(tokens[a], tokens[b]) >= DEDUPE_THRESHOLD:
+                    parent[root_a] = root_b
+
+    clusters = {}
+    for i, rec in enumerate(records):
+        clusters.setdefault(find(i), []).append(rec)
+    result = [sorted(cluster, key=keeper_rank, reverse=True) for cluster in clusters.values() if len(cluster) > 1]
+    result.sort(key=len, reverse=True)
+    return result
+
+
+def merged_fields(cluster):
+    """
+    فیلدهای تغییرکرده رکورد نگه‌داشته (اولین رکورد خوشه) پس از ادغام: فیلدهای خالی از بقیه
+    پر می‌شوند و توضیحات متفاوت پشت سر هم می‌آیند. وضعیت و تاریخ پایان یک واحدند: رکورد باز
+    تاریخ پایان نمی‌گیرد و وضعیت خالی همراه تاریخ پایان همان رکورد پر می‌شود.
+    """
+    keeper = cluster[0]
+    values = {}
+    for field in MERGE_FIELDS:
+        if not keeper.get(field):
+            value = next((rec.get(field) for rec in cluster[1:] if rec.get(field)), "")
+            if value:
+                values[field] = value
+    status = keeper.get("status", "")
+    if not status:
+        donor = next((rec for rec in cluster[1:] if rec.get("status")), None)
+        if donor is not None:
+            values["status"] = donor["status"]
+            if donor["status"] in FINISHED_STATUSES and donor.get("end_date"):
+                values["end_date"] = donor["end_date"]
+    elif status in FINISHED_STATUSES and not keeper.get("end_date"):
+        end_date = next((rec.get("end_date") for rec in cluster[1:]
+                         if rec.get("status") in FINISHED_STATUSES and rec.get("end_date")), "")
+        if end_date:
+            values["end_date"] = end_date
+    descriptions = []
+    for rec in cluster:
+        text = load_description(rec).strip()
+        if text and text not in descriptions:
+            descriptions.append(text)
+    description = "\n".join(descriptions)
+    if description != load_description(keeper):
+        values["description"] = description
+    return values
+
+
+# ---------- مرتب‌سازی و صفحه‌بندی ----------
+STATUS_SORT_ORDER = {"در انتظار تماس مجدد": 1, "انتظار": 2, "خرید": 3, "از دست رفته": 4, "": 5}
+SORT_DATE_FIELDS = {"تاریخ تماس بعدی": "next_call_date", "تاریخ ویزیت": "visit_date", "تاریخ پایان": "end_date"}
+PAGE_SIZES = ("25", "50", "100", "200", "500")
+
+
+def make_sort_key(sort_by, ranks=None):
+    """
+    ساخت تابع کلید مرتب‌سازی برای ستون انتخاب‌شده.
+    تاریخ‌ها به شماره روز تبدیل می‌شوند تا همیشه قابل مقایسه باشند (تاریخ خالی = 0).
+    ranks (id رکورد -> رتبه) برای مرتب‌سازی بر اساس ارتباط با جستجو استفاده می‌شود.
+    """
+    if sort_by == "ارتباط با جستجو":
+        ranks = ranks or {}
+        return lambda rec: ranks.get(id(rec), len(ranks))
+    if sort_by in SORT_DATE_FIELDS:
+        field = SORT_DATE_FIELDS[sort_by]
+        return lambda rec: shamsi_to_ordinal(rec.get(field, "")) or 0
+    if sort_by == "نام مهندس":
+        return lambda rec: rec.get("name", "")
+    if sort_by == "وضعیت":
+        return lambda rec: STATUS_SORT_ORDER.get(rec.get("status", ""), 99)
+    return lambda rec: ""
+
+
+class KeysetPager:
+    """
+    صفحه‌بندی keyset روی ستون مرتب‌سازی فعال.
+    هر صفحه با جستجوی دودویی روی کلید (مقدار ستون، کلید رکورد، شماره ترتیب) اولین/آخرین ردیف
+    صفحه فعلی پیدا می‌شود؛ بنابراین صفحات عمیق نیازی به پیمایش offset ندارند.
+    شماره ترتیب کلید را یکتا می‌کند تا رکوردهای تکراری در مرز دو صفحه جا نیفتند.
+    """
+
+    def __init__(self, records, key_func, reverse=False, page_size=50):
+        records = list(records)
+        decorated = sorted((((key_func(rec), record_key(rec), seq), rec) for seq, rec in enumerate(records)),
+                           key=lambda d: d[0])
+        self._keys = [k for k, _ in decorated]
+        self._recs = [rec for _, rec in decorated]
+        self._key_func = key_func
+        self._seq = itertools.count(len(records))
+        self._key_of = {id(rec): k for k, rec in decorated}  # کلیدی که هر رکورد با آن درج شده است
+        self.reverse = reverse
+        self.page_size = max(1, int(page_size))
+        self.first_key = None
+        self.last_key = None
+
+    def __len__(self):
+        return len(self._recs)
+
+    def add(self, rec):
+        """درج یک رکورد در جای مرتب خود بدون مرتب‌سازی دوباره همه رکوردها."""
+        key = (self._key_func(rec), record_key(rec), next(self._seq))
+        i = bisect.bisect_right(self._keys, key)
+        self._keys.insert(i, key)
+        self._recs.insert(i, rec)
+        self._key_of[id(rec)] = key
+
+    def discard(self, rec):
+        """حذف رکورد با کلیدی که با آن درج شده بود (حتی اگر فیلدهایش بعداً تغییر کرده باشد)."""
+        key = self._key_of.pop(id(rec), None)
+        if key is None:
+            return
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+            del self._recs[i]
+
+    def iter_all(self):
+        """همه رکوردهای نما به ترتیب نمایش (برای خروجی)."""
+        return reversed(self._recs) if self.reverse else iter(self._recs)
+
+    @property
+    def page_count(self):
+        return max(1, -(-len(self._recs) // self.page_size))
+
+    @property
+    def page_number(self):
+        """شماره صفحه فعلی (از ۱) بر اساس مکان کلید اولین ردیف."""
+        if self.first_key is None:
+            return 1
+        i = bisect.bisect_left(self._keys, self.first_key)
+        pos = len(self._keys) - 1 - i if self.reverse else i
+        return pos // self.page_size + 1
+
+    def _slice(self, lo, hi):
+        recs = self._recs[lo:hi]
+        keys = self._keys[lo:hi]
+        if self.reverse:
+            recs.reverse()
+            keys.reverse()
+        self.first_key = keys[0] if keys else None
+        self.last_key = keys[-1] if keys else None
+        return recs
+
+    def _page_ending_at(self, hi):
+        return self._slice(max(0, hi - self.page_size), hi)
+
+    def first_page(self):
+        if self.reverse:
+            return self._page_ending_at(len(self._recs))
+        return self._slice(0, self.page_size)
+
+    def last_page(self):
+        tail = (self.page_count - 1) * self.page_size
+        if self.reverse:
+            return self._slice(0, len(self._recs) - tail)
+        return self._slice(tail, tail + self.page_size)
+
+    def next_page(self):
+        """صفحه بعد از آخرین ردیف فعلی؛ در انتهای لیست None."""
+        if self.last_key is None:
+            return None
+        if self.reverse:
+            i = bisect.bisect_left(self._keys, self.last_key)
+            return self._page_ending_at(i) if i > 0 else None
+        i = bisect.bisect_right(self._keys, self.last_key)
+        return self._slice(i, i + self.page_size) if i < len(self._keys) else None
+
+    def prev_page(self):
+        """صفحه قبل از اولین ردیف فعلی؛ در ابتدای لیست None."""
+        if self.first_key is None:
+            return None
+        if self.reverse:
+            i = bisect.bisect_right(self._keys, self.first_key)
+            return self._slice(i, i + self.page_size) if i < len(self._keys) else None
+        i = bisect.bisect_left(self._keys, self.first_key)
+        return self._page_ending_at(i) if i > 0 else None
+
+    def page_containing(self, cursor):
+        """صفحه‌ای که کلید cursor در آن قرار می‌گیرد (برای حفظ مکان پس از ویرایش)."""
+        if cursor is None or not self._keys:
+            return self.first_page()
+        i = min(bisect.bisect_left(self._keys, cursor), len(self._keys) - 1)
+        if self.reverse:
+            hi = len(self._keys) - ((len(self._keys) - 1 - i) // self.page_size) * self.page_size
+            return self._page_ending_at(hi)
+        start = (i // self.page_size) * self.page_size
+        return self._slice(start, start + self.page_size)
+
+
+# ---------- خط لوله خروجی (Excel، PDF، CSV، JSONL) ----------
+EXPORT_COLUMNS = (
+    ("name", "نام مهندس"),
+    ("address", "آدرس"),
+    ("area", "متراژ"),
+    ("rooms", "تعداد اتاق"),
+    ("visit_date", "تاریخ ویزیت"),
+    ("next_call_date", "تاریخ تماس بعدی"),
+    ("status", "وضعیت"),
+    ("description", "توضیحات"),
+    ("end_date", "تاریخ پایان"),
+)
+EXPORT_HEADERS = [header for _, header in EXPORT_COLUMNS]
+STATUS_COLORS = {
+    "از دست رفته": "f8d7da",
+    "خرید": "d4edda",
+    "انتظار": "fff3cd",
+    "در انتظار تماس مجدد": "d1ecf1",
+}
+
+
+def export_rows(records, columns=EXPORT_COLUMNS):
+    """
+    خط لوله خروجی: منبع (هر iterable از رکوردها) ← انتخاب ستون‌ها ← قالب‌بندی.
+    به صورت generator کار می‌کند و برای هر رکورد (لیست مقادیر ستون‌ها، وضعیت) تولید می‌کند.
+    """
+    for rec in records:
+        # توضیحات طولانی فقط اینجا و در صورت انتخاب ستون از فایل توضیحات خوانده می‌شوند
+        yield ([(load_description(rec) if field == "description" else rec.get(field)) or ""
+                for field, _ in columns], rec.get("status", ""))
+
+
+def write_excel_report(filepath, records):
+    """نوشتن گزارش Excel با رنگ‌بندی وضعیت‌ها؛ مسیر فایل را برمی‌گرداند."""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "گزارش پروژه‌ها"
+
+    ws.append(EXPORT_HEADERS)
+
+    ws.sheet_view.rightToLeft = True
+
+    fills = {status: PatternFill(start_color=color, end_color=color, fill_type="solid")
+             for status, color in STATUS_COLORS.items()}
+
+    for row_data, status in export_rows(records):
+        ws.append(row_data)
+
+        fill = fills.get(status)
+        if fill:
+            for cell in ws[ws.max_row]:
+                cell.fill = fill
+
+    for col_idx, column in enumerate(ws.columns, 1):
+        max_length = 0
+        for cell in column:
+            try:
+                if len(str(cell.value)) > max_length:
+                    max_length = len(str(cell.value))
+            except:
+                pass
+        adjusted_width = (max_length + 2)
+        ws.column_dimensions[get_column_letter(col_idx)].width = adjusted_width
+
+    wb.save(filepath)
+    return filepath
+
+
+# چیدمان PDF (اندازه‌ها بر حسب سانتی‌متر؛ ستون‌ها از راست به چپ)
+PDF_HEADERS = ["تاریخ پایان", "توضیحات", "وضعیت", "تماس بعدی", "تاریخ ویزیت", "اتاق", "متراژ", "آدرس",
+               "نام مهندس"]
+PDF_COL_WIDTHS_CM = [2.5, 4, 2.5, 2.5, 2.5, 1, 1.5, 4, 2.5]
+PDF_MARGIN_CM = 2
+PDF_MIN_ROW_HEIGHT_CM = 0.8
+PDF_LINE_HEIGHT_CM = 0.4
+PDF_CELL_PADDING_CM = 0.15
+PDF_MAX_CELL_LINES = 12  # ردیف‌های خیلی بلند حداکثر این تعداد خط دارند تا در یک صفحه جا شوند
+PDF_PAGES_PER_CHUNK = 20  # تعداد صفحه هر دسته در تولید موازی (مستقل از تعداد پردازنده‌ها)
+
+
+def ensure_pdf_font():
+    """ثبت فونت PDF بدون پیام رابط کاربری (برای پردازه‌های کارگر)."""
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, PDF_FONT_PATH))
+
+
+def wrap_pdf_text(text, font_size, max_width, max_lines=PDF_MAX_CELL_LINES):
+    """شکستن متن به چند خط با اندازه‌گیری واقعی عرض کلمات."""
+    text = " ".join(str(text).split())
+    if not text:
+        return [""]
+
+    def width(t):
+        return pdfmetrics.stringWidth(t, PDF_FONT_NAME, font_size)
+
+    lines = []
+    current = ""
+    for word in text.split(" "):
+        candidate = f"{current} {word}" if current else word
+        if width(candidate) <= max_width:
+            current = candidate
+            continue
+        if current:
+            lines.append(current)
+        # کلمه‌ای که به تنهایی از عرض ستون بلندتر است حرف به حرف شکسته می‌شود
+        current = ""
+        for ch in word:
+            if current and width(current + ch) > max_width:
+                lines.append(current)
+                current = ch
+            else:
+                current += ch
+    if current:
+        lines.append(current)
+
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = lines[-1][:max(0, len(lines[-1]) - 3)] + "..."
+    return lines
+
+
+def layout_pdf_report(records):
+    """
+    مرحله چیدمان: اندازه‌گیری همه ردیف‌ها یک بار و صفحه‌بندی قطعی.
+    خروجی لیست صفحات است؛ هر صفحه لیست (y بالای ردیف، ارتفاع، وضعیت، خطوط هر ستون).
+    """
+    ensure_pdf_font()
+    width, height = A4
+    margin = PDF_MARGIN_CM * cm
+    col_widths = [w * cm for w in PDF_COL_WIDTHS_CM]
+    padding = PDF_CELL_PADDING_CM * cm
+    line_height = PDF_LINE_HEIGHT_CM * cm
+    min_row_height = PDF_MIN_ROW_HEIGHT_CM * cm
+
+    first_page_top = height - margin - 4 * cm  # عنوان، تاریخ تولید و سربرگ جدول
+    page_top = height - margin - 1 * cm  # سربرگ جدول
+    bottom = margin
+
+    pages = [[]]
+    y = first_page_top
+    for values, status in export_rows(records):
+        # ستون‌های PDF از راست به چپ رسم می‌شوند
+        cells = [wrap_pdf_text(value, 8, col_widths[i] - 2 * padding)
+                 for i, value in enumerate(reversed(values))]
+        row_height = max(min_row_height, max(len(lines) for lines in cells) * line_height + 2 * padding)
+        if y - row_height < bottom and pages[-1]:
+            pages.append([])
+            y = page_top
+        pages[-1].append((y, row_height, status, cells))
+        y -= row_height
+    return pages
+
+
+def render_pdf_pages(pages, first_page_number, total_pages, generated_at):
+    """رسم صفحات از پیش چیده‌شده در یک سند PDF؛ بایت‌های PDF را برمی‌گرداند."""
+    ensure_pdf_font()
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    width, height = A4
+    margin = PDF_MARGIN_CM * cm
+    col_widths = [w * cm for w in PDF_COL_WIDTHS_CM]
+    padding = PDF_CELL_PADDING_CM * cm
+    line_height = PDF_LINE_HEIGHT_CM * cm
+    x_start = width - margin
+
+    for offset, rows in enumerate(pages):
+        page_number = first_page_number + offset
+        if page_number == 1:
+            y = height - margin
+            c.setFont(PDF_FONT_NAME, 16)
+            c.drawRightString(width - margin, y, "گزارش مدیریت پروژه‌ها")
+            y -= 1.5 * cm
+            c.setFont(PDF_FONT_NAME, 8)
+            c.drawRightString(width - margin, y,
+                              f"تاریخ تولید: {gregorian_datetime_to_shamsi_str(generated_at)} "
+                              f"{generated_at.strftime('%H:%M')}")
+            header_y = y - 2 * cm
+        else:
+            header_y = height - margin
+
+        c.setFont(PDF_FONT_NAME, 9)
+        current_x = x_start
+        for i, header in enumerate(PDF_HEADERS):
+            text_width = pdfmetrics.stringWidth(header, PDF_FONT_NAME, 9)
+            current_x -= col_widths[i]
+            c.drawString(current_x + (col_widths[i] - text_width) / 2, header_y, header)
+        c.line(margin, header_y - 0.5 * cm, width - margin, header_y - 0.5 * cm)
+
+        c.setFont(PDF_FONT_NAME, 8)
+        for row_top, row_height, status, cells in rows:
+            fill_color = colors.HexColor("#" + STATUS_COLORS[status]) if status in STATUS_COLORS else colors.white
+            c.setFillColor(fill_color)
+            c.rect(margin, row_top - row_height, sum(col_widths), row_height, fill=1, stroke=0)
+            c.setFillColor(colors.black)
+
+            current_x = x_start
+            for i, lines in enumerate(cells):
+                current_x -= col_widths[i]
+                # متن هر ستون در ارتفاع ردیف به صورت عمودی وسط‌چین می‌شود
+                line_y = row_top - (row_height - len(lines) * line_height) / 2 - line_height + 0.1 * cm
+                for line in lines:
+                    text_width = pdfmetrics.stringWidth(line, PDF_FONT_NAME, 8)
+                    c.drawString(current_x + (col_widths[i] - text_width) / 2, line_y, line)
+                    line_y -= line_height
+
+        c.drawCentredString(width / 2, margin / 2, f"صفحه {page_number} از {total_pages}")
+        c.showPage()
+
+    c.save()
+    return buffer.getvalue()
+
+
+def _render_pdf_chunk(args):
+    """کارگر تولید موازی: (صفحات، شماره صفحه اول، تعداد کل صفحات، زمان تولید)."""
+    return render_pdf_pages(*args)
+
+
+def write_pdf_report(filepath, records, generated_at=None, parallel=False):
+    """
+    نوشتن گزارش PDF با رنگ‌بندی وضعیت‌ها؛ مسیر فایل را برمی‌گرداند.
+    ابتدا همه ردیف‌ها اندازه‌گیری و صفحه‌بندی می‌شوند، سپس (در صورت parallel و وجود pypdf)
+    دسته‌های PDF_PAGES_PER_CHUNK صفحه‌ای در پردازه‌های جداگانه رسم و در یک سند ادغام می‌شوند.
+    با generated_at ثابت، خروجی مسیر سریال بایت به بایت تکرارپذیر است. خروجی موازی هم به تعداد
+    پردازنده‌ها بستگی ندارد، ولی با خروجی سریال یکی نیست و بزرگ‌تر است، چون هر دسته زیرمجموعه
+    فونت خودش را دارد؛ برای مقایسه بایتی (تست رگرسیون) از مسیر سریال استفاده کنید.
+    """
+    generated_at = generated_at or datetime.now()
+    pages = layout_pdf_report(records)
+    total = len(pages)
+
+    chunks = [(pages[i:i + PDF_PAGES_PER_CHUNK], i + 1, total, generated_at)
+              for i in range(0, total, PDF_PAGES_PER_CHUNK)]
+    if not parallel or not PDF_MERGE_AVAILABLE or len(chunks) < 2:
+        with open(filepath, "wb") as f:
+            f.write(render_pdf_pages(pages, 1, total, generated_at))
+        return filepath
+
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(chunks))) as executor:
+        rendered = list(executor.map(_render_pdf_chunk, chunks))
+
+    writer = PdfWriter()
+    for chunk_bytes in rendered:
+        writer.append(PdfReader(io.BytesIO(chunk_bytes)))
+    with open(filepath, "wb") as f:
+        writer.write(f)
+    return filepath
+
+
+def write_csv_report(filepath, records):
+    """نوشتن CSV به صورت جریانی (حافظه ثابت)؛ با BOM تا Excel متن فارسی را درست نمایش دهد."""
+    with open(filepath, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_HEADERS)
+        for values, _ in export_rows(records):
+            writer.writerow(values)
+    return filepath
+
+
+def write_jsonl_report(filepath, records):
+    """نوشتن JSON Lines به صورت جریانی (حافظه ثابت)؛ هر ردیف یک شیء JSON."""
+    fields = [field for field, _ in EXPORT_COLUMNS]
+    with open(filepath, "w", encoding="utf-8") as f:
+        for values, _ in export_rows(records):
+            f.write(json.dumps(dict(zip(fields, values)), ensure_ascii=False) + "\n")
+    return filepath
+
+
+# قالب خروجی -> (پسوند، تابع نوشتن، در دسترس بودن)
+EXPORT_SINKS = {
+    "Excel": (".xlsx", write_excel_report, EXCEL_AVAILABLE),
+    "PDF": (".pdf", write_pdf_report, PDF_AVAILABLE),
+    "CSV": (".csv", write_csv_report, True),
+    "JSONL": (".jsonl", write_jsonl_report, True),
+}
+EXPORT_SCOPES = ("همه رکوردها", "نمای فعلی")
+
+
+# ---------- خروجی تفکیکی (چند فایل) ----------
+PARTITION_KEYS = {
+    "نام مهندس": lambda rec: rec.get("name", "") or "بدون نام",
+    "وضعیت": lambda rec: rec.get("status", "") or "بدون وضعیت",
+    "ماه ویزیت": lambda rec: rec.get("visit_date", "")[:7] or "بدون تاریخ",
+}
+
+
+def partition_records(records, key_name):
+    """گروه‌بندی رکوردها بر اساس کلید انتخاب‌شده (مهندس، وضعیت یا ماه شمسی)."""
+    key_func = PARTITION_KEYS[key_name]
+    parts = {}
+    for rec in records:
+        parts.setdefault(key_func(rec), []).append(rec)
+    return parts
+
+
+def safe_filename(text):
+    """حذف نویسه‌های غیرمجاز از نام فایل (برای ویندوز و لینوکس)."""
+    return re.sub(r'[\\/:*?"<>|\s]+', "_", str(text)).strip("_") or "_"
+
+
+def submit_partitioned_export(executor, records, key_name, fmt, out_dir):
+    """ارسال هر بخش به یک پردازه کارگر؛ لیست (مسیر فایل، future) را برمی‌گرداند."""
+    ext, writer, _ = EXPORT_SINKS[fmt]
+    jobs = []
+    used = set()  # نام‌های گرفته‌شده (بدون حساسیت به بزرگی حروف، مثل ویندوز)
+    for part_key, part_records in partition_records(records, key_name).items():
+        # کلیدهای متفاوت ممکن است به یک نام فایل برسند («a/b» و «a b»)؛ هر بخش فایل خودش را می‌گیرد
+        stem = safe_filename(part_key)
+        name, suffix = stem, 1
+        while name.casefold() in used:
+            suffix += 1
+            name = f"{stem}_{suffix}"
+        used.add(name.casefold())
+        filepath = os.path.join(out_dir, name + ext)
+        # پردازه کارگر فایل توضیحات مجموعه داده فعال را نمی‌شناسد؛ متن کامل همراه رکورد فرستاده می‌شود
+        part_records = [portable_record(rec) for rec in part_records]
+        jobs.append((filepath, executor.submit(writer, filepath, part_records)))
+    return jobs
+
+
+# ---------- واگردانی (Undo/Redo) ----------
+UNDO_LIMIT = 200
+
+
+def tree_row_values(rec):
+    """مقادیر نمایشی یک رکورد در ستون‌های Treeview"""
+    return (
+        rec.get("name", ""),
+        rec.get("address", ""),
+        rec.get("area", ""),
+        rec.get("rooms", ""),
+        rec.get("visit_date", ""),
+        rec.get("next_call_date", ""),
+        rec.get("status", ""),
+        description_preview(rec),
+        rec.get("end_date", "")
+    )
+
+
+class CommandLog:
+    """
+    پشته واگردانی/انجام دوباره بر اساس عملیات معکوس حداقلی (نه کپی کل داده‌ها).
+    هر فرمان یک دیکشنری کوچک است:
+        {"op": "insert", "rec": rec, "index": i, "archive_year": سال بایگانی یا None,
+         "archived": رکورد اصلی بایگانی‌شده یا None}
+        {"op": "update", "rec": rec, "delta": {field: (old, new)}}
+        {"op": "delete", "removed": [(index, rec), ...]}
+        {"op": "archive_delete", "rec": rec, "year": سال}
+        {"op": "batch", "commands": [...]}
+    """
+
+    def __init__(self, limit=UNDO_LIMIT):
+        self._undo = deque(maxlen=limit)
+        self._redo = []
+
+    def record(self, command):
+        self._undo.append(command)
+        self._redo.clear()
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def pop_undo(self):
+        command = self._undo.pop()
+        self._redo.append(command)
+        return command
+
+    def pop_redo(self):
+        command = self._redo.pop()
+        self._undo.append(command)
+        return command
+
+
+# ---------- بارگذاری اولیه در پس‌زمینه ----------
+LOAD_CHUNK_ROWS = 500  # تعداد ردیف‌هایی که در هر نوبت حلقه رویداد به جدول اضافه می‌شوند
+LOAD_POLL_MS = 50
+
+
+# ---------- پشتیبان‌گیری افزایشی ----------
+BACKUP_DIR = "backups"
+BACKUP_FULL_EVERY = 50  # حداکثر تعداد نسخه تغییرات پس از هر نسخه کامل
+BACKUP_FULL_INTERVAL_HOURS = 24
+BACKUP_KEEP_DAYS = 30
+BACKUP_KEEP_FULL = 10
+BACKUP_STAMP_FORMAT = "%Y%m%dT%H%M%S%f"
+
+
+def backup_stamp_to_str(stamp):
+    """نمایش زمان یک نسخه پشتیبان به صورت تاریخ شمسی و ساعت"""
+    dt = datetime.strptime(stamp, BACKUP_STAMP_FORMAT)
+    return f"{gregorian_datetime_to_shamsi_str(dt)} {dt.strftime('%H:%M:%S')}"
+
+
+class BackupStore:
+    """
+    پشتیبان‌گیری افزایشی از یک فایل داده: نسخه‌های کامل دوره‌ای (full_<زمان>.json) و پس از هر
+    ذخیره فقط رکوردهای تغییرکرده یا حذف‌شده نسبت به نسخه قبلی (delta_<زمان>.json) بر اساس
+    کلید (name, address). هر نسخه با زمانش شناخته می‌شود و از نزدیک‌ترین نسخه کامل قبلی
+    به اضافه تغییرات بعد از آن بازسازی می‌شود.
+    توضیحات طولانی داخل نسخه‌ها نوشته می‌شوند تا پشتیبان به فایل توضیحات وابسته نباشد.
+    """
+
+    def __init__(self, directory=BACKUP_DIR, descriptions=None):
+        self.directory = directory
+        self.descriptions = descriptions
+        self._last_full = None  # (زمان آخرین نسخه کامل، تعداد نسخه تغییرات پس از آن)؛ با اولین استفاده خوانده می‌شود
+        self._last_stamp = ""
+
+    def _path(self, kind, stamp):
+        return os.path.join(self.directory, f"{kind}_{stamp}.json")
+
+    def points(self):
+        """همه نسخه‌های موجود به ترتیب زمان: لیست (زمان، نوع) که نوع full یا delta است."""
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for filename in os.listdir(self.directory):
+            match = re.fullmatch(r"(full|delta)_(\d{8}T\d{12})\.json", filename)
+            if match:
+                found.append((match.group(2), match.group(1)))
+        return sorted(found)
+
+    def _new_stamp(self):
+        stamp = datetime.now().strftime(BACKUP_STAMP_FORMAT)
+        if stamp <= self._last_stamp:  # دو ذخیره در یک میکروثانیه یا عقب رفتن ساعت
+            last = datetime.strptime(self._last_stamp, BACKUP_STAMP_FORMAT)
+            stamp = (last + timedelta(microseconds=1)).strftime(BACKUP_STAMP_FORMAT)
+        self._last_stamp = stamp
+        return stamp
+
+    def _write(self, kind, payload):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = self._new_stamp()
+        path = self._path(kind, stamp)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return stamp
+
+    def _read(self, kind, stamp):
+        with open(self._path(kind, stamp), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _full_state(self):
+        if self._last_full is None:
+            last_full, deltas = None, 0
+            for stamp, kind in self.points():
+                if kind == "full":
+                    last_full, deltas = stamp, 0
+                else:
+                    deltas += 1
+                self._last_stamp = max(self._last_stamp, stamp)
+            self._last_full = (last_full, deltas)
+        return self._last_full
+
+    def needs_full(self):
+        """آیا نسخه بعدی باید کامل باشد (نبود نسخه کامل، زنجیره طولانی یا قدیمی بودن آخرین نسخه کامل)؟"""
+        last_full, deltas = self._full_state()
+        if last_full is None or deltas >= BACKUP_FULL_EVERY:
+            return True
+        age = datetime.now() - datetime.strptime(last_full, BACKUP_STAMP_FORMAT)
+        return age > timedelta(hours=BACKUP_FULL_INTERVAL_HOURS)
+
+    def covers(self, data_path):
+        """آیا آخرین نسخه پس از آخرین نوشتن فایل داده ساخته شده است (فایل بیرون از زنجیره تغییر نکرده)؟"""
+        points = self.points()
+        if not points or not os.path.exists(data_path):
+            return not os.path.exists(data_path)
+        stamp, kind = points[-1]
+        return os.path.getmtime(self._path(kind, stamp)) >= os.path.getmtime(data_path)
+
+    def write_full(self, records):
+        stamp = self._write("full", {"records": [portable_record(rec, self.descriptions) for rec in records]})
+        self._last_full = (stamp, 0)
+        self.rotate()
+        return stamp
+
+    def write_delta(self, changes):
+        """
+        changes: کلید -> لیست همه رکوردهای فعلی با آن کلید (لیست خالی یعنی حذف).
+        رکوردهای تکراری با کلید یکسان با هم نوشته می‌شوند و در بازیابی با هم جایگزین می‌شوند.
+        """
+        payload = {"upserts": [portable_record(rec, self.descriptions) for records in changes.values() for rec in records],
+                   "deletes": [list(key) for key, records in changes.items() if not records]}
+        stamp = self._write("delta", payload)
+        last_full, deltas = self._full_state()
+        self._last_full = (last_full, deltas + 1)
+        return stamp
+
+    def record(self, records, changes):
+        """ثبت نسخه پس از یک ذخیره؛ هزینه متناسب با تعداد تغییرات است مگر زمان نسخه کامل رسیده باشد."""
+        if self.needs_full():
+            return self.write_full(records)
+        if changes:
+            return self.write_delta(changes)
+        return None
+
+    def restore(self, stamp):
+        """بازسازی رکوردها در زمان نسخه stamp (نسخه کامل قبلی + تغییرات تا همان زمان)."""
+        chain = []
+        for point_stamp, kind in self.points():
+            if point_stamp > stamp:
+                break
+            if kind == "full":
+                chain = [(point_stamp, kind)]
+            elif chain:
+                chain.append((point_stamp, kind))
+        if not chain or chain[-1][0] != stamp:
+            raise ValueError(f"نسخه پشتیبان {stamp} یافت نشد.")
+
+        # هر کلید به لیست رکوردهایش نگاشت می‌شود تا رکوردهای تکراری با کلید یکسان از بین نروند
+        by_key = OrderedDict()
+        for rec in self._read(*reversed(chain[0]))["records"]:
+            by_key.setdefault(record_key(rec), []).append(rec)
+        for point_stamp, kind in chain[1:]:
+            delta = self._read(kind, point_stamp)
+            for key in delta["deletes"]:
+                by_key.pop(tuple(key), None)
+            upserts = OrderedDict()
+            for rec in delta["upserts"]:
+                upserts.setdefault(record_key(rec), []).append(rec)
+            by_key.update(upserts)
+        return [rec for records in by_key.values() for rec in records]
+
+    def rotate(self, now=None):
+        """
+        حذف نسخه‌های قدیمی: نسخه‌های کامل بیش از BACKUP_KEEP_FULL یا قدیمی‌تر از BACKUP_KEEP_DAYS روز
+        همراه با تغییراتی که به آن‌ها وابسته‌اند. آخرین نسخه کامل همیشه می‌ماند.
+        """
+        points = self.points()
+        fulls = [stamp for stamp, kind in points if kind == "full"]
+        cutoff = ((now or datetime.now()) - timedelta(days=BACKUP_KEEP_DAYS)).strftime(BACKUP_STAMP_FORMAT)
+        kept = [stamp for stamp in fulls[-BACKUP_KEEP_FULL:] if stamp >= cutoff] or fulls[-1:]
+        if not kept:
+            return
+        for stamp, kind in points:
+            if stamp >= kept[0]:
+                break
+            try:
+                os.remove(self._path(kind, stamp))
+            except OSError as e:
+                print(f"Error removing old backup: {e}")
+
+
+# ---------- مجموعه‌های داده (فضاهای کاری) ----------
+WORKSPACE_CACHE_MB = 256  # سقف تقریبی حافظه مجموعه‌های داده باز (قابل تغییر با workspace_cache_mb در config)
+WORKSPACE_MEMORY_FACTOR = 6  # نسبت تقریبی حافظه رکوردها و ایندکس‌ها به حجم فایل JSON
+RECENT_WORKSPACES = 8
+
+
+def workspace_paths(data_file):
+    """
+    پوشه بایگانی، فایل توضیحات و پوشه پشتیبان کنار هر فایل داده
+    (فایل پیش‌فرض نام‌های قبلی را نگه می‌دارد).
+    """
+    if os.path.abspath(data_file) == os.path.abspath(DATA_FILE):
+        return ARCHIVE_DIR, DESCRIPTION_BLOB_FILE, BACKUP_DIR
+    stem = os.path.splitext(data_file)[0]
+    return stem + "_archive", stem + ".descriptions.blob", stem + "_backups"
+
+
+class Workspace:
+    """
+    یک مجموعه داده باز: رکوردهای فعال، بایگانی، فایل توضیحات، پشتیبان‌ها، ایندکس‌ها و تاریخچه واگردانی.
+    کلید رکوردهای تغییرکرده یا حذف‌شده از آخرین پشتیبان در dirty نگه داشته می‌شود.
+    """
+
+    def __init__(self, path):
+        archive_dir, blob_path, backup_dir = workspace_paths(path)
+        self.path = path
+        self.descriptions = BlobStore(blob_path)
+        self.archive = ArchiveStore(archive_dir, self.descriptions)
+        self.backups = BackupStore(backup_dir, self.descriptions)
+        self.dirty = set()
+        self.data = []
+        self.reminders = ReminderQueue()
+        self.search_index = SearchIndex()
+        self.history = CommandLog()
+        self.archived_count = 0
+        self.estimated_bytes = 0
+
+    def update_size_estimate(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        self.estimated_bytes = size * WORKSPACE_MEMORY_FACTOR
+
+    def mark_changed(self, rec):
+        self.dirty.add(record_key(rec))
+
+    def mark_removed(self, rec):
+        self.dirty.add(record_key(rec))
+
+    def backup(self):
+        """ثبت تغییرات پس از ذخیره فایل داده؛ خطای پشتیبان ذخیره اصلی را متوقف نمی‌کند."""
+        changes = {key: [] for key in self.dirty}
+        if changes:
+            for rec in self.data:
+                records = changes.get(record_key(rec))
+                if records is not None:
+                    records.append(rec)
+        try:
+            self.backups.record(self.data, changes)
+        except OSError as e:
+            print(f"Error writing backup: {e}")
+            return  # تغییرات در dirty می‌مانند تا در پشتیبان بعدی ثبت شوند
+        self.dirty = set()
+
+    def replace_records(self, records):
+        """جایگزینی همه رکوردها (بازیابی از پشتیبان) و ساخت دوباره ایندکس‌ها؛ تاریخچه واگردانی پاک می‌شود."""
+        # وضعیت فعلی هم یک نقطه بازیابی می‌ماند
+        self.backup()
+        if not self.backups.covers(self.path):
+            self.backups.write_full(self.data)
+        for rec in records:
+            externalize_description(rec, self.descriptions)
+        self.data[:] = records
+        self.reminders = ReminderQueue(self.data)
+        self.search_index = SearchIndex(self.data)
+        self.history = CommandLog()
+        self.dirty = set()
+        write_data_file(self.data, self.path)
+        self.backups.write_full(self.data)
+
+    def flush(self):
+        """
+        ذخیره تغییراتی که هنوز در فایل داده نوشته نشده‌اند (مثلاً وضعیت یادآوری‌ها). مجموعه بدون
+        تغییر بازنویسی نمی‌شود تا زمان فایل از آخرین پشتیبان جلو نیفتد و اجرای بعدی نسخه کامل نسازد.
+        """
+        if self.dirty:
+            write_data_file(self.data, self.path)
+            self.backup()
+        self.update_size_estimate()
+
+    def close(self):
+        self.descriptions.close()
+
+
+def load_workspace(path):
+    """
+    خواندن فایل داده، بایگانی پروژه‌های تمام شده و ساخت ایندکس‌ها.
+    هیچ فراخوانی Tk ندارد تا در نخ پس‌زمینه اجرا شود.
+    """
+    workspace = Workspace(path)
+    hot, workspace.archived_count = archive_finished(read_data_file(path), workspace.archive, path)
+    # توضیحات طولانی فایل‌های قدیمی یک بار به فایل توضیحات منتقل می‌شوند
+    if sum(externalize_description(rec, workspace.descriptions) for rec in hot):
+        write_data_file(hot, path)
+    workspace.data = hot
+    # اگر فایل بیرون از زنجیره پشتیبان تغییر کرده باشد (مثلاً بایگانی بالا) زنجیره از نو شروع می‌شود
+    try:
+        if workspace.backups.needs_full() or not workspace.backups.covers(path):
+            workspace.backups.write_full(hot)
+    except OSError as e:
+        print(f"Error writing backup: {e}")
+    workspace.reminders = ReminderQueue(hot)
+    workspace.search_index = SearchIndex(hot)
+    workspace.update_size_estimate()
+    return workspace
+
+
+class WorkspaceCache:
+    """
+    LRU مجموعه‌های داده بارگذاری‌شده با سقف حافظه تقریبی. مجموعه‌ای که خارج می‌شود
+    پیش از رها شدن ذخیره می‌شود؛ اگر ذخیره ناموفق باشد در حافظه می‌ماند تا داده‌ای از دست نرود.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._items = OrderedDict()  # مسیر مطلق -> Workspace (آخرین = اخیراً استفاده‌شده)
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def get(self, path):
+        workspace = self._items.get(self._key(path))
+        if workspace is not None:
+            self._items.move_to_end(self._key(path))
+        return workspace
+
+    def put(self, workspace):
+        """افزودن/تازه کردن مجموعه (به عنوان اخیراً استفاده‌شده)؛ مسیرهای خارج‌شده را برمی‌گرداند."""
+        key = self._key(workspace.path)
+        self._items[key] = workspace
+        self._items.move_to_end(key)
+        return self.evict()
+
+    def evict(self):
+        evicted = []
+        # مجموعه فعال (آخرین) هیچ‌وقت خارج نمی‌شود
+        while len(self._items) > 1 and \
+                sum(ws.estimated_bytes for ws in self._items.values()) > self.budget_bytes:
+            key, workspace = next(iter(self._items.items()))
+            try:
+                workspace.flush()
+            except OSError as e:
+                print(f"Error saving workspace {workspace.path}: {e}")
+                break
+            workspace.close()
+            del self._items[key]
+            evicted.append(workspace.path)
+        return evicted
+
+    def flush_all(self):
+        """ذخیره همه مجموعه‌های باز (هنگام بستن برنامه)؛ خطاها را برمی‌گرداند."""
+        errors = []
+        for workspace in self._items.values():
+            try:
+                workspace.flush()
+            except OSError as e:
+                errors.append(f"{workspace.path}: {e}")
+            workspace.close()
+        return errors
+
+
+def print_backups(path=None, out=None):
+    """چاپ نسخه‌های پشتیبان مجموعه داده (پیش‌فرض: آخرین مجموعه باز شده) بدون رابط گرافیکی."""
+    out = out or sys.stdout
+    path = path or load_config().get("workspace", DATA_FILE)
+    points = Workspace(path).backups.points()
+    if not points:
+        print("هیچ نسخه پشتیبانی وجود ندارد.", file=out)
+    for stamp, kind in points:
+        print(f"{stamp}  {kind:<5}  {backup_stamp_to_str(stamp)}", file=out)
+    return 0
+
+
+def restore_backup(stamp, path=None, out=None):
+    """بازیابی فایل داده به نسخه stamp بدون رابط گرافیکی (برنامه نباید همزمان باز باشد)."""
+    out = out or sys.stdout
+    workspace = Workspace(path or load_config().get("workspace", DATA_FILE))
+    try:
+        workspace.data = read_data_file(workspace.path)
+        workspace.replace_records(workspace.backups.restore(stamp))
+    except (OSError, ValueError) as e:
+        print(f"Error restoring backup: {e}", file=sys.stderr)
+        return 1
+    print(f"{len(workspace.data)} رکورد از نسخه {backup_stamp_to_str(stamp)} در {workspace.path} بازیابی شد.",
+          file=out)
+    return 0
+
+
 # ---------- کلاس اصلی برنامه ----------
 class ProjectManager:
     def __init__(self, root):
@@ -175,8 +1864,27 @@ class ProjectManager:
         self.config = load_config()
         self.current_theme = self.config.get("theme", "light")
 
-        # داده‌ها
-        self.data = load_data()
+        # داده‌ها (فقط پروژه‌های فعال؛ پروژه‌های تمام شده قدیمی به بایگانی منتقل می‌شوند)
+        # داده‌ها در نخ پس‌زمینه بارگذاری می‌شوند؛ تا آماده شدن ایندکس‌ها کنترل‌ها غیرفعال‌اند
+        self.ready = False
+        self.load_gated_frames = []
+        self._gated_widgets = []
+        self.include_archive_var = tk.BooleanVar(value=False)
+        self._from_archive = {}  # کلید -> سال بایگانی، برای رکوردهایی که از بایگانی در فرم بارگذاری شده‌اند
+        self._item_by_rec = {}  # id(rec) -> شناسه ردیف در Treeview (رکوردهای تکراری با کلید یکسان ردیف جدا دارند)
+        self._stashed_tables = {}  # مسیر مجموعه داده -> (Treeview، _item_by_rec، _row_counter) جدول کنارگذاشته
+        self._row_counter = 0  # تعداد ردیف‌های درج‌شده از آخرین بازسازی جدول (برای راه‌راه)
+
+        # یادآوری تماس‌ها (یک تایمر برای نزدیک‌ترین تماس)
+        self._reminder_after_id = None
+
+        # ترتیب ارتباط نتایج جستجوی نام مهندس و آدرس
+        self._search_ranks = None
+
+        # مجموعه داده فعال (داده‌ها، بایگانی، ایندکس‌ها و تاریخچه واگردانی) و مجموعه‌های اخیر در حافظه
+        self.workspaces = WorkspaceCache(self.config.get("workspace_cache_mb", WORKSPACE_CACHE_MB) * 1024 * 1024)
+        start_path = self.config.get("workspace", DATA_FILE)
+        self.bind_workspace(Workspace(start_path if os.path.exists(start_path) else DATA_FILE))
 
         # متغیرها
         self.entries = {}
@@ -194,10 +1902,242 @@ class ProjectManager:
         self.sort_by_var = tk.StringVar()
         self.sort_order_var = tk.StringVar()
 
+        # صفحه‌بندی
+        self.paginate_var = tk.BooleanVar(value=self.config.get("paginate", False))
+        self.page_size_var = tk.StringVar(value=str(self.config.get("page_size", 50)))
+        self.pager = None
+        self._pager_sort_state = None
+        self._page_redraw_pending = False
+        self._view_filter = None  # شرط فیلتر اعمال‌شده روی نمای فعلی (None یعنی همه رکوردها)
+        self.view_records = self.data  # رکوردهای نمای فعلی جدول (پس از فیلتر و مرتب‌سازی)
+        self.export_scope_var = tk.StringVar(value=EXPORT_SCOPES[0])
+
         self.create_widgets()
         self.apply_theme(self.current_theme)
-        self.refresh_table()
-        self.update_status_bar("برنامه آماده است.")
+        self.begin_background_load(self.workspace.path)
+
+    def save_workspace(self):
+        """ذخیره فایل داده مجموعه فعال و ثبت تغییرات آن در پشتیبان"""
+        save_data(self.data, self.workspace.path)
+        self.workspace.backup()
+
+    def bind_workspace(self, workspace):
+        """اتصال داده‌ها، بایگانی، ایندکس‌ها و تاریخچه یک مجموعه داده به برنامه"""
+        self.workspace = workspace
+        self.data = workspace.data
+        self.archive = workspace.archive
+        self.reminders = workspace.reminders
+        self.search_index = workspace.search_index
+        self.history = workspace.history
+        set_active_descriptions(workspace.descriptions)
+        self._from_archive = {}
+        self._search_ranks = None
+        self.pager = None
+        self._view_filter = None
+        self.view_records = self.data
+
+    def begin_background_load(self, path):
+        """نمایش فوری پنجره و بارگذاری داده‌ها در نخ پس‌زمینه"""
+        self.set_controls_enabled(False)
+        self.status_bar.config(text="در حال بارگذاری داده‌ها...")
+        self.loading_bar.pack(side="right", padx=5)
+        self.loading_bar.start(10)
+
+        results = queue.Queue()
+
+        def worker():
+            try:
+                results.put((True, load_workspace(path)))
+            except Exception as e:
+                results.put((False, e))
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(LOAD_POLL_MS, self.poll_background_load, results)
+
+    def poll_background_load(self, results):
+        """بررسی پایان بارگذاری پس‌زمینه (فراخوانی‌های Tk فقط در نخ اصلی)"""
+        try:
+            ok, payload = results.get_nowait()
+        except queue.Empty:
+            self.root.after(LOAD_POLL_MS, self.poll_background_load, results)
+            return
+
+        if ok:
+            workspace = payload
+        else:
+            messagebox.showerror("خطا", f"خطا در بارگذاری داده‌ها: {str(payload)}")
+            workspace = self.workspace  # مجموعه قبلی فعال می‌ماند
+        self.drop_stashed_tables(self.workspaces.put(workspace))
+        self.show_workspace(workspace)
+
+    def show_workspace(self, workspace):
+        """فعال کردن یک مجموعه داده و نمایش رکوردهای آن (کنترل‌ها باید غیرفعال باشند)"""
+        self.bind_workspace(workspace)
+        self.remember_workspace(workspace.path)
+        archived_count, workspace.archived_count = workspace.archived_count, 0
+
+        if self.paginate_var.get():
+            self.drop_stashed_tables([workspace.path])  # با صفحه‌بندی فقط یک صفحه بازسازی می‌شود
+            self.refresh_table()
+            self.finish_loading(archived_count)
+        elif self.restore_table(workspace.path):
+            # جدول کامل همین مجموعه از آخرین نمایش نگه داشته شده است؛ ردیف‌ها دوباره درج نمی‌شوند
+            self.finish_loading(archived_count)
+        else:
+            self.render_rows_chunked(self.data, lambda: self.finish_loading(archived_count))
+
+    def switch_workspace(self, path):
+        """رفتن به مجموعه داده دیگر؛ از حافظه (در صورت وجود) یا با بارگذاری در پس‌زمینه"""
+        if not self.ready or not path:
+            return
+        if WorkspaceCache._key(path) == WorkspaceCache._key(self.workspace.path):
+            return
+        self.ready = False
+        if self._reminder_after_id is not None:
+            self.root.after_cancel(self._reminder_after_id)
+            self._reminder_after_id = None
+        # پنجره‌های یادآوری به رکوردهای مجموعه قبلی اشاره می‌کنند
+        for child in self.root.winfo_children():
+            if isinstance(child, tk.Toplevel):
+                child.destroy()
+        self.stash_table()
+        workspace = self.workspaces.get(path)
+        if workspace is None:
+            self.begin_background_load(path)
+        else:
+            self.set_controls_enabled(False)
+            self.show_workspace(workspace)
+
+    def open_workspace(self):
+        """انتخاب یا ایجاد فایل داده از نوار ابزار"""
+        if not self.ready:
+            return
+        path = filedialog.asksaveasfilename(title="باز کردن یا ایجاد مجموعه داده", defaultextension=".json",
+                                            filetypes=[("JSON files", "*.json")], confirmoverwrite=False)
+        if path:
+            self.switch_workspace(path)
+
+    def show_backups(self):
+        """پنجره انتخاب نسخه پشتیبان و بازیابی مجموعه فعال به آن زمان"""
+        if not self.ready:
+            return
+        workspace = self.workspace
+        points = workspace.backups.points()
+        if not points:
+            messagebox.showinfo("پشتیبان", "هنوز نسخه پشتیبانی برای این مجموعه داده وجود ندارد.")
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title("بازیابی نسخه پشتیبان")
+        win.geometry("450x400")
+        win.transient(self.root)
+        ttk.Label(win, text=os.path.abspath(workspace.path), padding="10", anchor="e").pack(fill="x")
+
+        tree = ttk.Treeview(win, columns=("نوع", "زمان"), show="headings")
+        tree.heading("نوع", text="نوع")
+        tree.heading("زمان", text="زمان")
+        tree.column("نوع", width=120, anchor="center")
+        tree.column("زمان", width=250, anchor="center")
+        tree.pack(fill="both", expand=True, padx=10)
+        kind_labels = {"full": "نسخه کامل", "delta": "تغییرات"}
+        for stamp, kind in reversed(points):
+            tree.insert("", "end", iid=stamp, values=(kind_labels[kind], backup_stamp_to_str(stamp)))
+
+        def restore():
+            selected = tree.selection()
+            if not selected:
+                messagebox.showwarning("اخطار", "لطفاً یک نسخه انتخاب کنید.", parent=win)
+                return
+            stamp = selected[0]
+            if not messagebox.askyesno("تایید بازیابی",
+                                       f"همه رکوردها به وضعیت {backup_stamp_to_str(stamp)} برگردانده شوند؟\n"
+                                       "وضعیت فعلی هم به عنوان یک نسخه پشتیبان نگه داشته می‌شود.", parent=win):
+                return
+            try:
+                workspace.replace_records(workspace.backups.restore(stamp))
+            except (OSError, ValueError) as e:
+                messagebox.showerror("خطا", f"خطا در بازیابی نسخه پشتیبان: {str(e)}", parent=win)
+                return
+            win.destroy()
+            self.bind_workspace(workspace)
+            self.refresh_table()
+            self.update_undo_buttons()
+            self.schedule_reminder_check()
+            self.update_status_bar(f"{len(self.data)} رکورد از نسخه {backup_stamp_to_str(stamp)} بازیابی شد.")
+
+        actions = ttk.Frame(win, padding="10")
+        actions.pack(fill="x")
+        ttk.Button(actions, text="بستن", command=win.destroy).pack(side="left", padx=5)
+        ttk.Button(actions, text="بازیابی", command=restore, style="Primary.TButton").pack(side="right", padx=5)
+
+    def remember_workspace(self, path):
+        """ذخیره آخرین مجموعه داده و فهرست مجموعه‌های اخیر در تنظیمات"""
+        recent = [path] + [p for p in self.config.get("recent_workspaces", []) if p != path]
+        self.config["recent_workspaces"] = recent[:RECENT_WORKSPACES]
+        self.config["workspace"] = path
+        save_config(self.config)
+        self.workspace_combo["values"] = self.config["recent_workspaces"]
+        self.workspace_var.set(path)
+
+    def render_rows_chunked(self, records, on_done):
+        """درج ردیف‌ها در دسته‌های کوچک با root.after تا رابط کاربری پاسخ‌گو بماند"""
+        self.render_rows([])
+        rows = iter(records)
+        inserted = 0
+
+        def step():
+            nonlocal inserted
+            chunk = list(itertools.islice(rows, LOAD_CHUNK_ROWS))
+            for rec in chunk:
+                self.insert_tree_row(rec)
+            inserted += len(chunk)
+            self.status_bar.config(text=f"در حال نمایش رکوردها... {inserted} از {len(records)}")
+            if len(chunk) == LOAD_CHUNK_ROWS:
+                self.root.after(1, step)
+            else:
+                on_done()
+
+        step()
+
+    def finish_loading(self, archived_count):
+        """فعال کردن کنترل‌ها پس از آماده شدن داده‌ها و ایندکس‌ها"""
+        self.ready = True
+        self.loading_bar.stop()
+        self.loading_bar.pack_forget()
+        self.set_controls_enabled(True)
+        self.update_page_controls()
+        self.update_undo_buttons()
+        if archived_count:
+            self.update_status_bar(f"برنامه آماده است. {archived_count} پروژه تمام شده بایگانی شد.")
+        else:
+            self.update_status_bar("برنامه آماده است.")
+        self.schedule_reminder_check()
+
+    def set_controls_enabled(self, enabled):
+        """غیرفعال/فعال کردن کنترل‌های فیلتر، ویرایش و خروجی در زمان بارگذاری"""
+        if not enabled:
+            self._gated_widgets = []
+            pending = list(self.load_gated_frames)
+            while pending:
+                widget = pending.pop()
+                pending.extend(widget.winfo_children())
+                if isinstance(widget, (ttk.Button, ttk.Entry, ttk.Checkbutton)) \
+                        and not widget.instate(["disabled"]):
+                    widget.state(["disabled"])
+                    self._gated_widgets.append(widget)
+        else:
+            for widget in self._gated_widgets:
+                widget.state(["!disabled"])
+            self._gated_widgets = []
+
+    def on_close(self):
+        """ذخیره و بستن برنامه (اگر بارگذاری تمام نشده باشد، فایل داده بازنویسی نمی‌شود)"""
+        # فقط مجموعه‌هایی که کامل بارگذاری شده‌اند در حافظه نهان هستند و ذخیره می‌شوند
+        errors = self.workspaces.flush_all()
+        if errors:
+            messagebox.showerror("خطا", "خطا در ذخیره داده‌ها:\n" + "\n".join(errors))
+        save_config(self.config)
+        self.root.destroy()
 
     def create_widgets(self):
         """ایجاد عناصر واسط کاربری"""
@@ -207,6 +2147,27 @@ class ProjectManager:
         self.theme_toggle_button = ttk.Button(toolbar_frame, text="حالت تاریک", command=self.toggle_theme)
         self.theme_toggle_button.pack(side="left")
 
+        self.undo_button = ttk.Button(toolbar_frame, text="واگردانی", command=self.undo, state="disabled")
+        self.undo_button.pack(side="right", padx=2)
+        self.redo_button = ttk.Button(toolbar_frame, text="انجام دوباره", command=self.redo, state="disabled")
+        self.redo_button.pack(side="right", padx=2)
+        self.root.bind("<Control-z>", lambda e: self.on_undo_key(e, self.undo))
+        self.root.bind("<Control-y>", lambda e: self.on_undo_key(e, self.redo))
+        self.root.bind("<Control-Z>", lambda e: self.on_undo_key(e, self.redo))
+
+        ttk.Button(toolbar_frame, text="باز کردن فایل...", command=self.open_workspace).pack(side="right",
+                                                                                         padx=(20, 2))
+        self.workspace_var = tk.StringVar(value=self.workspace.path)
+        self.workspace_combo = ttk.Combobox(toolbar_frame, textvariable=self.workspace_var, width=40,
+                                            justify="right", state="readonly",
+                                            values=self.config.get("recent_workspaces", []))
+        self.workspace_combo.pack(side="right", padx=2)
+        self.workspace_combo.bind("<<ComboboxSelected>>",
+                                  lambda e: self.switch_workspace(self.workspace_var.get()))
+        ttk.Label(toolbar_frame, text="مجموعه داده:").pack(side="right", padx=2)
+        ttk.Button(toolbar_frame, text="بازیابی نسخه پشتیبان...", command=self.show_backups).pack(side="right",
+                                                                                               padx=(20, 2))
+
         main_frame = ttk.Frame(self.root, padding="10 10 10 10")
         main_frame.pack(fill="both", expand=True, padx=10, pady=5)
 
@@ -218,6 +2179,7 @@ class ProjectManager:
 
         self.status_bar = ttk.Label(self.root, text="", relief=tk.SUNKEN, anchor="w", padding="5 0 0 0",style="Statusbar.TLabel")
         self.status_bar.pack(side="bottom", fill="x")
+        self.loading_bar = ttk.Progressbar(self.status_bar, mode="indeterminate", length=150)
 
     def create_form(self, parent_frame):
         """ایجاد فرم ورود داده"""
@@ -287,6 +2249,7 @@ class ProjectManager:
     def create_buttons(self, parent_frame):
         """ایجاد دکمه‌های عملیات اصلی"""
         frame_buttons = ttk.Frame(parent_frame, padding="5")
+        self.load_gated_frames.append(frame_buttons)
         frame_buttons.pack(padx=5, pady=5, fill="x")
 
         ttk.Button(frame_buttons, text="افزودن/ویرایش", command=self.add_or_update_entry,
@@ -295,10 +2258,12 @@ class ProjectManager:
                    style="Danger.TButton").pack(side="right", padx=5)
         ttk.Button(frame_buttons, text="پاک کردن فرم", command=self.clear_fields).pack(side="right", padx=5)
         ttk.Button(frame_buttons, text="بارگذاری در فرم", command=self.load_to_form).pack(side="right", padx=5)
+        ttk.Button(frame_buttons, text="یافتن تکراری‌ها", command=self.show_duplicates).pack(side="left", padx=5)
 
     def create_filter_sort(self, parent_frame):
         """ایجاد بخش فیلتر و مرتب‌سازی"""
         frame_filter = ttk.LabelFrame(parent_frame, text="فیلتر و مرتب‌سازی", padding="10")
+        self.load_gated_frames.append(frame_filter)
         frame_filter.pack(padx=5, pady=5, fill="x")
 
         filter_row1 = ttk.Frame(frame_filter)
@@ -307,6 +2272,8 @@ class ProjectManager:
         ttk.Button(filter_row1, text="اعمال", command=self.apply_filter_sort, style="Primary.TButton").pack(side="left",
                                                                                                             padx=5)
         ttk.Button(filter_row1, text="پاک کردن فیلتر", command=self.clear_filters).pack(side="left", padx=5)
+        ttk.Checkbutton(filter_row1, text="شامل بایگانی", variable=self.include_archive_var,
+                        command=self.apply_filter_sort).pack(side="left", padx=5)
 
         self.sort_order = ttk.Combobox(filter_row1, textvariable=self.sort_order_var, width=10, justify="right",
                                        state="readonly")
@@ -316,7 +2283,8 @@ class ProjectManager:
 
         self.sort_by = ttk.Combobox(filter_row1, textvariable=self.sort_by_var, width=18, justify="right",
                                     state="readonly")
-        self.sort_by['values'] = ("تاریخ تماس بعدی", "تاریخ ویزیت", "تاریخ پایان", "نام مهندس", "وضعیت")
+        self.sort_by['values'] = ("تاریخ تماس بعدی", "تاریخ ویزیت", "تاریخ پایان", "نام مهندس", "وضعیت",
+                                  "ارتباط با جستجو")
         self.sort_by.set("تاریخ تماس بعدی")
         self.sort_by.pack(side="right", padx=5)
         ttk.Label(filter_row1, text="مرتب‌سازی:").pack(side="right", padx=(20, 5))
@@ -330,7 +2298,7 @@ class ProjectManager:
 
         self.filter_name = ttk.Entry(filter_row2, textvariable=self.filter_name_var, width=20, justify="right")
         self.filter_name.pack(side="right", padx=5)
-        ttk.Label(filter_row2, text="مهندس:").pack(side="right", padx=(20, 5))
+        ttk.Label(filter_row2, text="مهندس / آدرس:").pack(side="right", padx=(20, 5))
 
         self.filter_status = ttk.Combobox(filter_row2, textvariable=self.filter_status_var, width=15, justify="right",
                                           state="readonly")
@@ -353,13 +2321,24 @@ class ProjectManager:
 
     def create_table(self, parent_frame):
         """ایجاد جدول نمایش داده‌ها"""
-        table_frame = ttk.Frame(parent_frame, padding="5")
-        table_frame.pack(padx=5, pady=5, fill="both", expand=True)
+        self.table_frame = ttk.Frame(parent_frame, padding="5")
+        self.table_frame.pack(padx=5, pady=5, fill="both", expand=True)
+
+        self.tree = self.create_tree()
+        self.v_scrollbar = ttk.Scrollbar(self.table_frame, orient="vertical")
+        self.h_scrollbar = ttk.Scrollbar(self.table_frame, orient="horizontal")
+
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.v_scrollbar.pack(side="right", fill="y")
+        self.h_scrollbar.pack(side="bottom", fill="x")
+        self.attach_scrollbars()
 
+    def create_tree(self):
+        """ساخت یک Treeview خالی با ستون‌های جدول (هر مجموعه داده نگه‌داشته‌شده جدول خودش را دارد)"""
         cols = ("نام مهندس", "آدرس", "متراژ", "تعداد اتاق", "تاریخ ویزیت",
                 "تاریخ تماس بعدی", "وضعیت", "توضیحات", "تاریخ پایان")
 
-        self.tree = ttk.Treeview(table_frame, columns=cols, show="headings", height=15)
+        tree = ttk.Treeview(self.table_frame, columns=cols, show="headings", height=15)
 
         column_widths = {
             "نام مهندس": 120, "آدرس": 200, "متراژ": 80, "تعداد اتاق": 100,
@@ -367,38 +2346,108 @@ class ProjectManager:
             "توضیحات": 200, "تاریخ پایان": 120
         }
         for col in cols:
-            self.tree.heading(col, text=col)
+            tree.heading(col, text=col)
             # فونت برای سربرگ Treeview
-            self.tree.column(col, width=column_widths.get(col, 100), anchor="center")
-
-        v_scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
-        h_scrollbar = ttk.Scrollbar(table_frame, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
-
-        self.tree.pack(side="left", fill="both", expand=True)
-        v_scrollbar.pack(side="right", fill="y")
-        h_scrollbar.pack(side="bottom", fill="x")
+            tree.column(col, width=column_widths.get(col, 100), anchor="center")
+        return tree
+
+    def attach_scrollbars(self):
+        """اتصال نوارهای پیمایش به جدول نمایش داده‌شده"""
+        self.v_scrollbar.config(command=self.tree.yview)
+        self.h_scrollbar.config(command=self.tree.xview)
+        self.tree.configure(yscrollcommand=self.v_scrollbar.set, xscrollcommand=self.h_scrollbar.set)
+
+    def stash_table(self):
+        """
+        کنار گذاشتن جدول کامل مجموعه فعال پیش از رفتن به مجموعه دیگر، تا بازگشت به آن نیازی به
+        درج دوباره همه ردیف‌ها نداشته باشد. جدول صفحه‌بندی‌شده یا فیلترشده نگه داشته نمی‌شود
+        (بازسازی صفحه ارزان است و فیلتر با مجموعه بعدی معنا ندارد).
+        """
+        if self.pager is not None or self.view_records is not self.data:
+            return
+        self.tree.pack_forget()
+        self._stashed_tables[WorkspaceCache._key(self.workspace.path)] = (self.tree, self._item_by_rec,
+                                                                         self._row_counter)
+        self.tree = self.create_tree()
+        self.configure_row_tags(self.tree, self.current_theme)
+        self.tree.pack(side="left", fill="both", expand=True, before=self.v_scrollbar)
+        self.attach_scrollbars()
+        self._item_by_rec = {}
+        self._row_counter = 0
+
+    def restore_table(self, path):
+        """نمایش جدول کنارگذاشته‌شده مجموعه path به جای جدول فعلی؛ در صورت نبود False"""
+        stashed = self._stashed_tables.pop(WorkspaceCache._key(path), None)
+        if stashed is None:
+            return False
+        self.tree.destroy()
+        self.tree, self._item_by_rec, self._row_counter = stashed
+        self.tree.pack(side="left", fill="both", expand=True, before=self.v_scrollbar)
+        self.attach_scrollbars()
+        return True
+
+    def drop_stashed_tables(self, paths):
+        """آزاد کردن جدول‌های کنارگذاشته مجموعه‌هایی که از حافظه خارج شده‌اند"""
+        for path in paths:
+            stashed = self._stashed_tables.pop(WorkspaceCache._key(path), None)
+            if stashed is not None:
+                stashed[0].destroy()
 
     def create_export_buttons(self, parent_frame):
         """ایجاد دکمه‌های خروجی"""
         export_frame = ttk.Frame(parent_frame, padding="5")
+        self.load_gated_frames.append(export_frame)
         export_frame.pack(padx=5, pady=5, fill="x")
 
         if EXCEL_AVAILABLE:
-            ttk.Button(export_frame, text="خروجی Excel", command=self.export_to_excel,
+            ttk.Button(export_frame, text="خروجی Excel", command=lambda: self.export_to("Excel"),
                        style="Success.TButton").pack(side="right", padx=5)
         else:
             ttk.Button(export_frame, text="Excel غیرفعال (نیاز به openpyxl)",
                        state="disabled").pack(side="right", padx=5)
 
         if PDF_AVAILABLE:
-            ttk.Button(export_frame, text="خروجی PDF", command=self.export_to_pdf,
+            ttk.Button(export_frame, text="خروجی PDF", command=lambda: self.export_to("PDF"),
                        style="Info.TButton").pack(side="right", padx=5)
             register_persian_font_for_pdf()
         else:
             ttk.Button(export_frame, text="PDF غیرفعال (نیاز به reportlab)",
                        state="disabled").pack(side="right", padx=5)
 
+        ttk.Button(export_frame, text="خروجی CSV", command=lambda: self.export_to("CSV")).pack(side="right", padx=5)
+        ttk.Button(export_frame, text="خروجی JSONL", command=lambda: self.export_to("JSONL")).pack(side="right",
+                                                                                                    padx=5)
+        ttk.Button(export_frame, text="خروجی تفکیکی", command=self.export_partitioned).pack(side="right", padx=5)
+
+        scope_combo = ttk.Combobox(export_frame, textvariable=self.export_scope_var, values=EXPORT_SCOPES,
+                                   width=12, justify="right", state="readonly")
+        scope_combo.pack(side="right", padx=5)
+        ttk.Label(export_frame, text="محدوده:").pack(side="right", padx=(20, 5))
+
+        # کنترل‌های صفحه‌بندی
+        ttk.Checkbutton(export_frame, text="صفحه‌بندی", variable=self.paginate_var,
+                        command=self.on_pagination_change).pack(side="left", padx=5)
+        self.page_size_combo = ttk.Combobox(export_frame, textvariable=self.page_size_var, width=5,
+                                            justify="right", state="readonly")
+        self.page_size_combo['values'] = PAGE_SIZES
+        self.page_size_combo.pack(side="left", padx=5)
+        self.page_size_combo.bind("<<ComboboxSelected>>", lambda e: self.on_pagination_change())
+
+        self.page_buttons = [
+            ttk.Button(export_frame, text="ابتدا", width=6, command=lambda: self.show_page("first")),
+            ttk.Button(export_frame, text="قبلی", width=6, command=lambda: self.show_page("prev")),
+        ]
+        self.page_label = ttk.Label(export_frame, text="", width=18, anchor="center")
+        self.page_buttons += [
+            ttk.Button(export_frame, text="بعدی", width=6, command=lambda: self.show_page("next")),
+            ttk.Button(export_frame, text="انتها", width=6, command=lambda: self.show_page("last")),
+        ]
+        for button in self.page_buttons[:2]:
+            button.pack(side="left", padx=2)
+        self.page_label.pack(side="left", padx=2)
+        for button in self.page_buttons[2:]:
+            button.pack(side="left", padx=2)
+
     def on_finished_change(self, *args):
         """رویداد تغییر وضعیت تمام شده"""
         if self.finished_var.get():
@@ -452,6 +2501,11 @@ class ProjectManager:
                 found_rec = rec
                 break
 
+        if found_rec is None and self.include_archive_var.get():
+            found_rec = self.archive.find((selected_name, selected_address))
+            if found_rec:
+                self._from_archive[record_key(found_rec)] = archive_year(found_rec)
+
         if found_rec:
             self.clear_fields()
 
@@ -462,7 +2516,7 @@ class ProjectManager:
             self.entries["visit_date"].insert(0, found_rec.get("visit_date", ""))
             self.entries["next_call_date"].insert(0, found_rec.get("next_call_date", ""))
 
-            description_text = found_rec.get("description", "")
+            description_text = load_description(found_rec)
             self.entries["description"].insert("1.0", description_text)
 
             end_date_text = found_rec.get("end_date", "")
@@ -482,44 +2536,370 @@ class ProjectManager:
 
     def refresh_table(self, filtered_data=None):
         """بروزرسانی جدول"""
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-
         display_data = filtered_data if filtered_data is not None else self.data
+        if filtered_data is None:
+            self._view_filter = None
+
+        if self.paginate_var.get():
+            sort_state = (self.sort_by_var.get(), self.sort_order_var.get())
+            # پس از ویرایش، همان صفحه‌ای که کاربر در آن بود دوباره نمایش داده می‌شود
+            cursor = self.pager.first_key if self.pager and self._pager_sort_state == sort_state else None
+            self._pager_sort_state = sort_state
+            self.pager = KeysetPager(display_data, make_sort_key(sort_state[0], self._search_ranks),
+                                     reverse=(sort_state[1] == "نزولی"),
+                                     page_size=self.page_size_var.get())
+            self.render_rows(self.pager.page_containing(cursor))
+        else:
+            self.pager = None
+            self.render_rows(display_data)
+        self.view_records = display_data
+        self.update_page_controls()
 
-        self.style_treeview_tags()
+    def render_rows(self, display_data):
+        """درج ردیف‌ها در Treeview به جای ردیف‌های قبلی"""
+        self.tree.delete(*self.tree.get_children())
+        self._item_by_rec = {}
+        self._row_counter = 0
 
         for rec in display_data:
-            current_status = rec.get("status", "")
-            is_finished_in_data = (current_status in ("از دست رفته", "خرید"))
-            if not is_finished_in_data:
-                rec["status"] = determine_status(rec.get("next_call_date"), is_finished_in_data)
-
-            vals = (
-                rec.get("name", ""),
-                rec.get("address", ""),
-                rec.get("area", ""),
-                rec.get("rooms", ""),
-                rec.get("visit_date", ""),
-                rec.get("next_call_date", ""),
-                rec.get("status", ""),
-                rec.get("description", "")[:50] + "..." if len(rec.get("description", "")) > 50 else rec.get(
-                    "description", ""),
-                rec.get("end_date", "")
-            )
-
-            status = rec.get("status", "")
-            tag = ""
-            if status == "از دست رفته":
-                tag = "tag_red"
-            elif status == "خرید":
-                tag = "tag_green"
-            elif status == "انتظار":
-                tag = "tag_yellow"
-            elif status == "در انتظار تماس مجدد":
-                tag = "tag_blue"
-
-            self.tree.insert("", "end", values=vals, tags=(tag,))
+            self.insert_tree_row(rec)
+
+    def insert_tree_row(self, rec):
+        """محاسبه وضعیت و درج یک ردیف در انتهای جدول"""
+        current_status = rec.get("status", "")
+        is_finished_in_data = (current_status in ("از دست رفته", "خرید"))
+        if not is_finished_in_data:
+            rec["status"] = determine_status(rec.get("next_call_date"), is_finished_in_data)
+
+        self._item_by_rec[id(rec)] = self.tree.insert("", "end", values=tree_row_values(rec),
+                                                      tags=self.new_row_tags(rec))
+
+    def new_row_tags(self, rec):
+        """
+        تگ‌های یک ردیف جدید: رنگ وضعیت و راه‌راه یک در میان. فقط یک بار در زمان درج تعیین
+        می‌شوند تا تغییر تم یا بازسازی جدول نیازی به پیمایش و تگ‌گذاری دوباره ردیف‌ها نداشته باشد
+        (پس از حذف یک ردیف، راه‌راه‌ها تا بازسازی بعدی جدول ممکن است یک در میان نباشند).
+        """
+        tag = STATUS_TAGS.get(rec.get("status", ""), "")
+        tags = [tag] if tag else []
+        if self._row_counter % 2 == 0:
+            tags.append("alternate_row")
+        self._row_counter += 1
+        return tags
+
+    def upsert_tree_row(self, rec):
+        """درج یا بروزرسانی یک ردیف جدول بدون بازسازی کل Treeview"""
+        tag = STATUS_TAGS.get(rec.get("status", ""), "")
+        item_id = self._item_by_rec.get(id(rec))
+        if item_id is not None and self.tree.exists(item_id):
+            tags = [t for t in self.tree.item(item_id, "tags") if t not in STATUS_TAGS.values()]
+            if tag:
+                tags.append(tag)
+            self.tree.item(item_id, values=tree_row_values(rec), tags=tags)
+        else:
+            self._item_by_rec[id(rec)] = self.tree.insert("", "end", values=tree_row_values(rec),
+                                                          tags=self.new_row_tags(rec))
+
+    def remove_tree_row(self, rec):
+        """حذف ردیف یک رکورد از جدول (در صورت نمایش)"""
+        item_id = self._item_by_rec.pop(id(rec), None)
+        if item_id is not None and self.tree.exists(item_id):
+            self.tree.delete(item_id)
+
+    def sync_view(self, rec, present):
+        """
+        هماهنگ نگه‌داشتن نمای فعلی پس از درج، حذف یا ویرایش یک رکورد: لیست فیلترشده و صفحه‌بند
+        بروزرسانی می‌شوند و رکورد فقط اگر با فیلتر اعمال‌شده بخواند نمایش داده می‌شود.
+        """
+        show = present and (self._view_filter is None or self._view_filter(rec))
+        if self.view_records is not self.data:
+            position = next((i for i, other in enumerate(self.view_records) if other is rec), None)
+            if show and position is None:
+                self.view_records.append(rec)
+            elif not show and position is not None:
+                del self.view_records[position]
+        if self.pager is not None:
+            self.pager.discard(rec)
+            if show:
+                self.pager.add(rec)
+            # چند تغییر پشت سر هم (مثلاً واگردانی گروهی) فقط یک بار صفحه را بازسازی می‌کنند
+            if not self._page_redraw_pending:
+                self._page_redraw_pending = True
+                self.root.after_idle(self.redraw_page)
+        elif show:
+            self.upsert_tree_row(rec)
+        else:
+            self.remove_tree_row(rec)
+
+    def redraw_page(self):
+        """نمایش دوباره صفحه فعلی پس از تغییر رکوردهای صفحه‌بند"""
+        self._page_redraw_pending = False
+        if self.pager is not None:
+            self.render_rows(self.pager.page_containing(self.pager.first_key))
+            self.update_page_controls()
+
+    def hide_archived_from_view(self, archived):
+        """حذف ردیف رکورد بایگانی‌شده archived (خوانده‌شده با «شامل بایگانی») از نمای فعلی"""
+        if self.view_records is self.data:
+            return
+        hot = {id(rec) for rec in self.data}
+        shown = next((rec for rec in self.view_records if id(rec) not in hot and rec == archived), None)
+        if shown is not None:
+            self.sync_view(shown, present=False)
+
+    def insert_record(self, rec, index):
+        """درج رکورد در داده‌ها، ایندکس‌ها و جدول"""
+        externalize_description(rec)
+        self.workspace.mark_changed(rec)
+        self.data.insert(min(index, len(self.data)), rec)
+        self.search_index.add(rec)
+        self.reminders.update(rec)
+        self.sync_view(rec, present=True)
+
+    def remove_record(self, rec, index):
+        """حذف رکورد از داده‌ها، ایندکس‌ها و جدول (index فقط راهنمای مکان است)"""
+        if index < len(self.data) and self.data[index] is rec:
+            del self.data[index]
+        else:
+            for i, other in enumerate(self.data):
+                if other is rec:
+                    del self.data[i]
+                    break
+        self.search_index.remove(rec)
+        self.reminders.remove(rec)
+        self.workspace.mark_removed(rec)
+        self.sync_view(rec, present=False)
+
+    def set_record_fields(self, rec, values):
+        """تغییر فیلدهای رکورد و بروزرسانی ایندکس‌ها و ردیف جدول"""
+        rec.update(values)
+        externalize_description(rec)
+        self.workspace.mark_changed(rec)
+        self.reminders.update(rec)
+        self.sync_view(rec, present=True)
+
+    def apply_command(self, command, undo):
+        """اجرای یک فرمان ثبت‌شده در جهت واگردانی (undo=True) یا انجام دوباره"""
+        op = command["op"]
+        if op == "batch":
+            for sub in (reversed(command["commands"]) if undo else command["commands"]):
+                self.apply_command(sub, undo)
+        elif op == "update":
+            side = 0 if undo else 1
+            self.set_record_fields(command["rec"], {f: v[side] for f, v in command["delta"].items()})
+        elif op == "insert":
+            rec = command["rec"]
+            year = command.get("archive_year")
+            archived = command.get("archived")
+            if undo:
+                self.remove_record(rec, command["index"])
+                if year:
+                    self.archive.archive([archived or rec])
+                    if archived and self.include_archive_var.get():
+                        self.sync_view(archived, present=True)
+            else:
+                if year:
+                    self.archive.remove(record_key(rec), year, payload=archived)
+                if archived:
+                    self.hide_archived_from_view(archived)
+                self.insert_record(rec, command["index"])
+        elif op == "delete":
+            if undo:
+                for index, rec in command["removed"]:
+                    self.insert_record(rec, index)
+            else:
+                for index, rec in reversed(command["removed"]):
+                    self.remove_record(rec, index)
+        elif op == "archive_delete":
+            rec = command["rec"]
+            if undo:
+                self.archive.archive([rec])
+                self.sync_view(rec, present=self.include_archive_var.get())
+            else:
+                self.archive.remove(record_key(rec), command["year"], payload=rec)
+                self.hide_archived_from_view(rec)
+
+    def merge_clusters(self, clusters):
+        """ادغام خوشه‌های تکراری با یک ذخیره و یک فرمان واگردانی"""
+        index_of = {id(rec): i for i, rec in enumerate(self.data)}
+        keepers = []
+        removed = []
+        for cluster in clusters:
+            cluster = [rec for rec in cluster if id(rec) in index_of]  # رکوردهایی که در این فاصله حذف نشده‌اند
+            if len(cluster) < 2:
+                continue
+            keepers.append((cluster[0], merged_fields(cluster)))
+            removed.extend((index_of[id(rec)], rec) for rec in cluster[1:])
+        if not removed:
+            return 0
+        removed.sort(key=lambda item: item[0])
+
+        # ابتدا حذف، سپس بروزرسانی رکوردهای نگه‌داشته (واگردانی به ترتیب عکس)
+        for index, rec in reversed(removed):
+            self.remove_record(rec, index)
+        commands = [{"op": "delete", "removed": removed}]
+        for keeper, values in keepers:
+            delta = {field: (load_description(keeper) if field == "description" else keeper.get(field, ""), value)
+                     for field, value in values.items()}
+            self.set_record_fields(keeper, values)
+            if delta:
+                commands.append({"op": "update", "rec": keeper, "delta": delta})
+        self.record_command({"op": "batch", "commands": commands})
+        self.save_workspace()
+        self.schedule_reminder_check()
+        return len(removed)
+
+    def show_duplicates(self):
+        """یافتن رکوردهای احتمالاً تکراری و پنجره بررسی برای ادغام یا نادیده گرفتن هر گروه"""
+        if not self.ready:
+            return
+        start = time.perf_counter()
+        clusters = find_duplicate_clusters(self.data)
+        elapsed = time.perf_counter() - start
+        if not clusters:
+            messagebox.showinfo("تکراری‌ها", f"رکورد تکراری یافت نشد ({elapsed:.1f} ثانیه).")
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title("رکوردهای احتمالاً تکراری")
+        win.geometry("800x500")
+        win.transient(self.root)
+        win.grab_set()  # تا پایان بررسی، داده‌ها از پنجره اصلی تغییر نمی‌کنند
+
+        summary = ttk.Label(win, padding="10", anchor="e")
+        summary.pack(fill="x")
+
+        tree = ttk.Treeview(win, columns=("آدرس", "تاریخ ویزیت", "وضعیت"), show="tree headings")
+        tree.heading("#0", text="نام مهندس")
+        for col in ("آدرس", "تاریخ ویزیت", "وضعیت"):
+            tree.heading(col, text=col)
+            tree.column(col, anchor="center")
+        tree.pack(fill="both", expand=True, padx=10)
+
+        cluster_by_item = {}
+        for number, cluster in enumerate(clusters, 1):
+            group = tree.insert("", "end", text=f"گروه {number} ({len(cluster)} رکورد)", open=True)
+            cluster_by_item[group] = cluster
+            for position, rec in enumerate(cluster):
+                # ★ رکوردی است که نگه داشته می‌شود
+                tree.insert(group, "end", text=("★ " if position == 0 else "") + str(rec.get("name", "")),
+                            values=(rec.get("address", ""), rec.get("visit_date", ""), rec.get("status", "")))
+
+        def update_summary():
+            count = sum(len(cluster) for cluster in cluster_by_item.values())
+            summary.config(text=f"{len(cluster_by_item)} گروه ({count} رکورد) در {elapsed:.1f} ثانیه یافت شد. "
+                                "رکورد ستاره‌دار هر گروه نگه داشته می‌شود.")
+
+        def selected_groups():
+            groups = []
+            for item_id in tree.selection():
+                group = tree.parent(item_id) or item_id
+                if group not in groups:
+                    groups.append(group)
+            return groups
+
+        def close_groups(groups):
+            for group in groups:
+                del cluster_by_item[group]
+                tree.delete(group)
+            if cluster_by_item:
+                update_summary()
+            else:
+                win.destroy()
+
+        def merge(groups):
+            if not groups:
+                messagebox.showwarning("اخطار", "لطفاً یک گروه انتخاب کنید.", parent=win)
+                return
+            merged = self.merge_clusters([cluster_by_item[group] for group in groups])
+            close_groups(groups)
+            self.update_status_bar(f"{merged} رکورد تکراری ادغام شد.")
+
+        def dismiss():
+            groups = selected_groups()
+            if not groups:
+                messagebox.showwarning("اخطار", "لطفاً یک گروه انتخاب کنید.", parent=win)
+                return
+            close_groups(groups)
+
+        update_summary()
+        actions = ttk.Frame(win, padding="10")
+        actions.pack(fill="x")
+        ttk.Button(actions, text="بستن", command=win.destroy).pack(side="left", padx=5)
+        ttk.Button(actions, text="ادغام همه", command=lambda: merge(list(cluster_by_item)),
+                   style="Primary.TButton").pack(side="right", padx=5)
+        ttk.Button(actions, text="ادغام گروه‌های انتخاب‌شده", command=lambda: merge(selected_groups())).pack(
+            side="right", padx=5)
+        ttk.Button(actions, text="نادیده گرفتن", command=dismiss).pack(side="right", padx=5)
+
+    def record_command(self, command):
+        """ثبت فرمان در تاریخچه واگردانی"""
+        self.history.record(command)
+        self.update_undo_buttons()
+
+    def undo(self):
+        """واگردانی آخرین تغییر"""
+        if not self.history.can_undo():
+            return
+        self.apply_command(self.history.pop_undo(), undo=True)
+        self.save_workspace()
+        self.schedule_reminder_check()
+        self.update_undo_buttons()
+        self.update_status_bar("آخرین تغییر واگردانی شد.")
+
+    def redo(self):
+        """انجام دوباره آخرین تغییر واگردانی‌شده"""
+        if not self.history.can_redo():
+            return
+        self.apply_command(self.history.pop_redo(), undo=False)
+        self.save_workspace()
+        self.schedule_reminder_check()
+        self.update_undo_buttons()
+        self.update_status_bar("تغییر دوباره انجام شد.")
+
+    def on_undo_key(self, event, action):
+        """میانبر صفحه‌کلید؛ در فیلدهای متنی به ویرایشگر همان فیلد واگذار می‌شود"""
+        if isinstance(event.widget, (tk.Entry, ttk.Entry, tk.Text)):
+            return None
+        action()
+        return "break"
+
+    def update_undo_buttons(self):
+        self.undo_button.config(state="normal" if self.history.can_undo() else "disabled")
+        self.redo_button.config(state="normal" if self.history.can_redo() else "disabled")
+
+    def on_pagination_change(self):
+        """فعال/غیرفعال کردن صفحه‌بندی یا تغییر اندازه صفحه"""
+        self.config["paginate"] = self.paginate_var.get()
+        self.config["page_size"] = int(self.page_size_var.get())
+        save_config(self.config)
+        self.pager = None
+        self.apply_filter_sort()
+
+    def show_page(self, where):
+        """پیمایش صفحه‌ها با حفظ فیلتر و مرتب‌سازی فعلی"""
+        if self.pager is None:
+            return
+        page = {
+            "first": self.pager.first_page,
+            "prev": self.pager.prev_page,
+            "next": self.pager.next_page,
+            "last": self.pager.last_page,
+        }[where]()
+        if page is not None:
+            self.render_rows(page)
+            self.update_page_controls()
+
+    def update_page_controls(self):
+        """بروزرسانی برچسب «صفحه x از y» و وضعیت دکمه‌های پیمایش"""
+        state = "normal" if self.pager is not None else "disabled"
+        for button in self.page_buttons:
+            button.config(state=state)
+        self.page_size_combo.config(state="readonly" if self.pager is not None else "disabled")
+        if self.pager is None:
+            self.page_label.config(text="")
+        else:
+            self.page_label.config(text=f"صفحه {self.pager.page_number} از {self.pager.page_count}")
 
     def add_or_update_entry(self):
         """افزودن یا ویرایش رکورد"""
@@ -556,37 +2936,46 @@ class ProjectManager:
 
         actual_status = status if finished else determine_status(next_call_date, finished)
 
-        found = False
+        values = {
+            "area": area,
+            "rooms": rooms,
+            "visit_date": visit_date,
+            "next_call_date": next_call_date,
+            "status": actual_status,
+            "description": description,
+            "end_date": end_date
+        }
+
+        found = None
         for rec in self.data:
             if rec.get("name") == name and rec.get("address") == address:
-                rec.update({
-                    "area": area,
-                    "rooms": rooms,
-                    "visit_date": visit_date,
-                    "next_call_date": next_call_date,
-                    "status": actual_status,
-                    "description": description,
-                    "end_date": end_date
-                })
-                found = True
+                found = rec
                 break
 
-        if not found:
-            new_rec = {
-                "name": name,
-                "address": address,
-                "area": area,
-                "rooms": rooms,
-                "visit_date": visit_date,
-                "next_call_date": next_call_date,
-                "status": actual_status,
-                "description": description,
-                "end_date": end_date
-            }
-            self.data.append(new_rec)
-
-        save_data(self.data)
-        self.refresh_table()
+        if found:
+            # فقط فیلدهای تغییرکرده در تاریخچه واگردانی ثبت می‌شوند
+            current = dict(found, description=load_description(found))
+            delta = {field: (current.get(field, ""), value) for field, value in values.items()
+                     if current.get(field, "") != value}
+            if delta:
+                self.set_record_fields(found, {field: new for field, (_, new) in delta.items()})
+                self.record_command({"op": "update", "rec": found, "delta": delta})
+        else:
+            new_rec = {"name": name, "address": address, **values}
+            # ویرایش رکورد بایگانی‌شده آن را به مجموعه کاری برمی‌گرداند
+            from_year = self._from_archive.pop((name, address), None)
+            archived = None
+            if from_year:
+                # نسخه اصلی بایگانی در فرمان نگه داشته می‌شود تا واگردانی همان را برگرداند
+                archived = self.archive.remove((name, address), from_year)
+                if archived:
+                    self.hide_archived_from_view(archived)
+            self.insert_record(new_rec, len(self.data))
+            self.record_command({"op": "insert", "rec": new_rec, "index": len(self.data) - 1,
+                                 "archive_year": from_year, "archived": archived})
+
+        self.save_workspace()
+        self.schedule_reminder_check()
         self.clear_fields()
         self.update_status_bar("رکورد با موفقیت ذخیره شد.")
 
@@ -599,85 +2988,237 @@ class ProjectManager:
             return
 
         if messagebox.askyesno("تایید حذف", "آیا مطمئن هستید که می‌خواهید این رکورد را حذف کنید؟"):
-            item = self.tree.item(selected[0])
-            values = item["values"]
-            if not values:
-                return
+            self.delete_item(selected[0])
 
-            name = values[0]
-            address = values[1]
-            self.data = [rec for rec in self.data if not (rec.get("name") == name and rec.get("address") == address)]
-            save_data(self.data)
-            self.refresh_table()
-            self.update_status_bar("رکورد با موفقیت حذف شد.")
+    def delete_item(self, item_id):
+        """حذف رکورد مربوط به یک ردیف جدول (بدون پرسش تایید)"""
+        values = self.tree.item(item_id)["values"]
+        if not values:
+            return
+
+        name = values[0]
+        address = values[1]
+        removed = [(i, rec) for i, rec in enumerate(self.data)
+                   if rec.get("name") == name and rec.get("address") == address]
+        for index, rec in reversed(removed):
+            self.remove_record(rec, index)
+        if removed:
+            self.record_command({"op": "delete", "removed": removed})
+        elif self.include_archive_var.get():
+            archived = self.archive.remove((name, address))
+            if archived:
+                self.hide_archived_from_view(archived)
+                self.record_command({"op": "archive_delete", "rec": archived,
+                                     "year": archive_year(archived)})
+        self.save_workspace()
+        self.schedule_reminder_check()
+        self.update_status_bar("رکورد با موفقیت حذف شد.")
 
     def apply_filter_sort(self):
         """اعمال فیلتر و مرتب‌سازی"""
-        filtered = []
         status_filter = self.filter_status_var.get()
-        name_filter = self.filter_name_var.get().strip().lower()
-        keyword_filter = self.filter_keyword_var.get().strip().lower()
+        name_filter = normalize_for_search(self.filter_name_var.get())
+        keyword_filter = normalize_for_search(self.filter_keyword_var.get())
         date_from_str = self.filter_date_from_var.get().strip()
         date_to_str = self.filter_date_to_var.get().strip()
 
-        dt_from = shamsi_to_gregorian_datetime(date_from_str) if date_from_str else None
-        dt_to = shamsi_to_gregorian_datetime(date_to_str) if date_to_str else None
+        dt_from = jalali_to_ordinal(date_from_str) if date_from_str else None
+        dt_to = jalali_to_ordinal(date_to_str) if date_to_str else None
 
-        for rec in self.data:
-            if status_filter != "همه" and rec.get("status") != status_filter:
-                continue
+        # جستجوی نام/آدرس از ایندکس سه‌حرفی فقط کاندیدها را (به ترتیب ارتباط) برمی‌گرداند
+        # بایگانی فقط در صورت درخواست و به صورت جریانی (فایل به فایل) خوانده می‌شود
+        if name_filter:
+            source = self.search_index.search(name_filter)
+            if self.include_archive_var.get():
+                source = rank_records(name_filter, itertools.chain(source, self.archive.iter_records()))
+            self._search_ranks = {id(rec): rank for rank, rec in enumerate(source)}
+        else:
+            source = self.data
+            if self.include_archive_var.get():
+                source = itertools.chain(source, self.archive.iter_records())
+            self._search_ranks = None
 
-            if name_filter and name_filter not in rec.get("name", "").lower():
-                continue
+        def passes_filters(rec):
+            if status_filter != "همه" and rec.get("status") != status_filter:
+                return False
 
-            if keyword_filter and keyword_filter not in rec.get("description", "").lower():
-                continue
+            if keyword_filter and keyword_filter not in normalize_for_search(load_description(rec)):
+                return False
 
             next_call_date_rec = rec.get("next_call_date", "")
             if next_call_date_rec:
-                dt_next_call_rec = shamsi_to_gregorian_datetime(next_call_date_rec)
+                dt_next_call_rec = jalali_to_ordinal(next_call_date_rec)
                 if dt_next_call_rec:
                     if dt_from and dt_next_call_rec < dt_from:
-                        continue
+                        return False
                     if dt_to and dt_next_call_rec > dt_to:
-                        continue
+                        return False
                 elif dt_from or dt_to:
-                    continue
+                    return False
             elif dt_from or dt_to:
-                continue
+                return False
+            return True
 
-            filtered.append(rec)
+        filtered = [rec for rec in source if passes_filters(rec)]
 
         sort_by = self.sort_by_var.get()
         sort_order = self.sort_order_var.get()
         reverse = (sort_order == "نزولی")
 
-        def get_sort_key(rec):
-            if sort_by == "تاریخ تماس بعدی":
-                dt = shamsi_to_gregorian_datetime(rec.get("next_call_date", ""))
-                return dt if dt is not None else datetime.min
-            elif sort_by == "تاریخ ویزیت":
-                dt = shamsi_to_gregorian_datetime(rec.get("visit_date", ""))
-                return dt if dt is not None else datetime.min
-            elif sort_by == "تاریخ پایان":
-                dt = shamsi_to_gregorian_datetime(rec.get("end_date", ""))
-                return dt if dt is not None else datetime.min
-            elif sort_by == "نام مهندس":
-                return rec.get("name", "")
-            elif sort_by == "وضعیت":
-                status_order = {"در انتظار تماس مجدد": 1, "انتظار": 2, "خرید": 3, "از دست رفته": 4, "": 5}
-                return status_order.get(rec.get("status", ""), 99)
-            return ""
-
-        filtered.sort(key=get_sort_key, reverse=reverse)
+        if not self.paginate_var.get():
+            filtered.sort(key=make_sort_key(sort_by, self._search_ranks), reverse=reverse)
+        self.pager = None  # فیلتر یا مرتب‌سازی جدید از صفحه اول شروع می‌شود
         self.refresh_table(filtered)
+        # فیلتر اعمال‌شده برای رکوردهایی که بعداً درج یا ویرایش می‌شوند (sync_view) نگه داشته می‌شود
+        if name_filter:
+            self._view_filter = lambda rec: search_score(
+                name_filter, normalize_for_search(rec.get("name", "")),
+                normalize_for_search(rec.get("address", ""))) is not None and passes_filters(rec)
+        else:
+            self._view_filter = passes_filters
         self.update_status_bar(f"{len(filtered)} رکورد فیلتر و مرتب‌سازی شد.")
 
+    def schedule_reminder_check(self):
+        """تنظیم تنها تایمر یادآوری برای نزدیک‌ترین تاریخ تماس در صف."""
+        if self._reminder_after_id is not None:
+            self.root.after_cancel(self._reminder_after_id)
+            self._reminder_after_id = None
+
+        next_day = self.reminders.peek_day()
+        if next_day is None:
+            return
+
+        now = datetime.now()
+        if next_day <= now.toordinal():
+            delay_ms = 0
+        else:
+            fire_at = datetime.combine(date.fromordinal(next_day), datetime.min.time())
+            delay_ms = min(int((fire_at - now).total_seconds() * 1000), REMINDER_MAX_WAIT_MS)
+        self._reminder_after_id = self.root.after(delay_ms, self.check_reminders)
+
+    def check_reminders(self):
+        """برداشتن تماس‌های سررسید از صف و نمایش یک اعلان گروهی."""
+        self._reminder_after_id = None
+        due = self.reminders.pop_due()
+        if due:
+            for rec in due:
+                rec["status"] = "در انتظار تماس مجدد"
+                self.workspace.mark_changed(rec)
+                self.update_tree_row(rec)
+            self.show_due_reminders(due)
+        self.schedule_reminder_check()
+
+    def update_tree_row(self, rec):
+        """بروزرسانی ستون وضعیت و رنگ یک ردیف بدون بازسازی کل جدول."""
+        item_id = self._item_by_rec.get(id(rec))
+        if item_id is None or not self.tree.exists(item_id):
+            return
+        status = rec.get("status", "")
+        self.tree.set(item_id, "وضعیت", status)
+        tags = [t for t in self.tree.item(item_id, "tags") if t not in STATUS_TAGS.values()]
+        tag = STATUS_TAGS.get(status, "")
+        if tag:
+            tags.append(tag)
+        self.tree.item(item_id, tags=tags)
+
+    def show_due_reminders(self, due):
+        """پنجره اعلان تماس‌های سررسید، گروه‌بندی شده بر اساس مهندس."""
+        win = tk.Toplevel(self.root)
+        win.title("یادآوری تماس‌ها")
+        win.geometry("600x400")
+
+        ttk.Label(win, text=f"{len(due)} تماس سررسید شده است.", padding="10").pack(fill="x")
+
+        tree = ttk.Treeview(win, columns=("آدرس", "تاریخ تماس بعدی"), show="tree headings")
+        tree.heading("#0", text="نام مهندس")
+        tree.heading("آدرس", text="آدرس")
+        tree.heading("تاریخ تماس بعدی", text="تاریخ تماس بعدی")
+        tree.pack(fill="both", expand=True, padx=10)
+
+        rec_by_item = {}
+        for name, recs in group_by_engineer(due).items():
+            parent = tree.insert("", "end", text=f"{name} ({len(recs)})", open=True)
+            for rec in recs:
+                item_id = tree.insert(parent, "end", text=name,
+                                      values=(rec.get("address", ""), rec.get("next_call_date", "")))
+                rec_by_item[item_id] = rec
+
+        def selected_records():
+            recs = []
+            for item_id in tree.selection():
+                if item_id in rec_by_item:
+                    recs.append(rec_by_item[item_id])
+                else:
+                    recs.extend(rec_by_item[child] for child in tree.get_children(item_id))
+            return recs
+
+        def snooze():
+            recs = selected_records()
+            for rec in recs:
+                self.reminders.snooze(rec, 1)
+                for item_id, r in list(rec_by_item.items()):
+                    if r is rec and tree.exists(item_id):
+                        tree.delete(item_id)
+            self.schedule_reminder_check()
+            self.update_status_bar(f"{len(recs)} یادآوری یک روز به تعویق افتاد.")
+
+        def reschedule():
+            recs = selected_records()
+            if not recs:
+                messagebox.showwarning("اخطار", "لطفاً یک رکورد انتخاب کنید.", parent=win)
+                return
+            new_date = new_date_var.get().strip()
+            if parse_shamsi_date(new_date) is None:
+                messagebox.showerror("خطا", "فرمت تاریخ تماس بعدی صحیح نیست (مثال: ۱۴۰۲/۰۱/۰۱).", parent=win)
+                return
+            commands = []
+            for rec in recs:
+                before = {"next_call_date": rec.get("next_call_date", ""), "status": rec.get("status", "")}
+                self.reminders.reschedule(rec, new_date)
+                self.workspace.mark_changed(rec)
+                commands.append({"op": "update", "rec": rec,
+                                 "delta": {f: (old, rec.get(f, "")) for f, old in before.items()}})
+                item_id = self._item_by_rec.get(id(rec))
+                if item_id is not None and self.tree.exists(item_id):
+                    self.tree.set(item_id, "تاریخ تماس بعدی", new_date)
+                self.update_tree_row(rec)
+                for child_id, r in list(rec_by_item.items()):
+                    if r is rec and tree.exists(child_id):
+                        tree.delete(child_id)
+            self.record_command({"op": "batch", "commands": commands})
+            self.save_workspace()
+            self.schedule_reminder_check()
+            self.update_status_bar(f"تاریخ تماس {len(recs)} رکورد تغییر کرد.")
+
+        actions = ttk.Frame(win, padding="10")
+        actions.pack(fill="x")
+        ttk.Button(actions, text="بستن", command=win.destroy).pack(side="left", padx=5)
+        ttk.Button(actions, text="تغییر تاریخ", command=reschedule, style="Primary.TButton").pack(side="right", padx=5)
+        new_date_var = tk.StringVar(value=ordinal_to_shamsi_str(date.today().toordinal() + 7))
+        ttk.Entry(actions, textvariable=new_date_var, width=12, justify="right").pack(side="right", padx=5)
+        ttk.Button(actions, text="تعویق یک روز", command=snooze).pack(side="right", padx=5)
+
     def update_status_bar(self, message, duration_ms=3000):
         """نمایش پیام در نوار وضعیت"""
         self.status_bar.config(text=message)
         self.root.after(duration_ms, lambda: self.status_bar.config(text=""))
 
+    @staticmethod
+    def configure_row_tags(tree, theme_name="light"):
+        """رنگ تگ‌های وضعیت و راه‌راه ردیف‌های یک جدول در تم theme_name"""
+        if theme_name == "dark":
+            tree.tag_configure("tag_red", background="#8b0000", foreground="black")
+            tree.tag_configure("tag_green", background="#006400", foreground="black")
+            tree.tag_configure("tag_yellow", background="#b8860b", foreground="black")
+            tree.tag_configure("tag_blue", background="#00008b", foreground="black")
+            tree.tag_configure("alternate_row", background="#3a3a3a", foreground="#ffffff")
+        else:  # light
+            tree.tag_configure("tag_red", background="#f8d7da", foreground="black")
+            tree.tag_configure("tag_green", background="#d4edda", foreground="black")
+            tree.tag_configure("tag_yellow", background="#fff3cd", foreground="black")
+            tree.tag_configure("tag_blue", background="#d1ecf1", foreground="black")
+            tree.tag_configure("alternate_row", background="#e0e0e0", foreground="#333333")
+
     def apply_theme(self, theme_name):
         """اعمال تم (روشن یا تاریک) به تمام عناصر UI"""
         self.current_theme = "light"
@@ -756,35 +3297,13 @@ class ProjectManager:
                              font=(GLOBAL_FONT_NAME, GLOBAL_FONT_SIZE, "bold"))
         self.style.map("Treeview.Heading", background=[("active", btn_hover_bg)])
 
-        if theme_name == "dark":
-            self.tree.tag_configure("tag_red", background="#8b0000", foreground="black")
-            self.tree.tag_configure("tag_green", background="#006400", foreground="black")
-            self.tree.tag_configure("tag_yellow", background="#b8860b", foreground="black")
-            self.tree.tag_configure("tag_blue", background="#00008b", foreground="black")
-            self.tree.tag_configure("alternate_row", background="#3a3a3a", foreground=fg_color)
-        else:  # light
-            self.tree.tag_configure("tag_red", background="#f8d7da", foreground="black")
-            self.tree.tag_configure("tag_green", background="#d4edda", foreground="black")
-            self.tree.tag_configure("tag_yellow", background="#fff3cd", foreground="black")
-            self.tree.tag_configure("tag_blue", background="#d1ecf1", foreground="black")
-            self.tree.tag_configure("alternate_row", background="#e0e0e0", foreground=fg_color)
+        self.configure_row_tags(self.tree, theme_name)
+        for tree, _, _ in self._stashed_tables.values():
+            self.configure_row_tags(tree, theme_name)
 
         # ✅ اطمینان از رنگ‌بندی درست Text در هر تم
         self.entries["description"].config(bg=entry_bg, fg=entry_fg, insertbackground=entry_fg)
-
-        # 🔁 بازنویسی تگ‌های Treeview
-        self.style_treeview_tags()
-
-    def style_treeview_tags(self):
-        """اعمال رنگ‌بندی به تگ‌های Treeview بر اساس تم فعلی."""
-        for i, item_id in enumerate(self.tree.get_children()):
-            tags = list(self.tree.item(item_id, "tags"))
-            tags = [t for t in tags if t not in ["alternate_row"]]  # حذف تگ قبلی
-
-            if i % 2 == 0:
-                tags.append("alternate_row")
-
-            self.tree.item(item_id, tags=tags)
+        # ردیف‌ها تگ‌هایشان را از زمان درج دارند؛ تغییر تم فقط پیکربندی تگ‌ها را عوض می‌کند
 
     def toggle_theme(self):
         """تغییر تم بین حالت روشن و تاریک"""
@@ -808,107 +3327,27 @@ class ProjectManager:
 
         return '#%02x%02x%02x' % tuple(darkened_rgb)
 
-    def export_to_excel(self):
-        """خروجی به فایل Excel"""
-        if not EXCEL_AVAILABLE:
-            messagebox.showerror("خطا", "کتابخانه openpyxl نصب نیست.")
+    def export_to(self, fmt):
+        """خروجی یکپارچه: منبع انتخاب‌شده (همه یا نمای فعلی) به قالب fmt"""
+        ext, writer, available = EXPORT_SINKS[fmt]
+        if not available:
+            messagebox.showerror("خطا", "کتابخانه openpyxl نصب نیست." if fmt == "Excel"
+                                 else "کتابخانه reportlab نصب نیست.")
             return
 
-        if not self.data:
+        if self.export_scope_is_empty():
             messagebox.showinfo("اطلاع", "هیچ داده‌ای برای خروجی وجود ندارد.")
             return
 
         filepath = filedialog.asksaveasfilename(
-            defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
-            title="ذخیره فایل اکسل"
+            defaultextension=ext,
+            filetypes=[(f"{fmt} files", f"*{ext}"), ("All files", "*.*")],
+            title=f"ذخیره فایل {fmt}"
         )
         if not filepath:
             return
 
-        try:
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "گزارش پروژه‌ها"
-
-            headers = ["نام مهندس", "آدرس", "متراژ", "تعداد اتاق", "تاریخ ویزیت",
-                       "تاریخ تماس بعدی", "وضعیت", "توضیحات", "تاریخ پایان"]
-            ws.append(headers)
-
-            ws.sheet_view.rightToLeft = True
-
-            fill_red = PatternFill(start_color="f8d7da", end_color="f8d7da", fill_type="solid")
-            fill_green = PatternFill(start_color="d4edda", end_color="d4edda", fill_type="solid")
-            fill_yellow = PatternFill(start_color="fff3cd", end_color="fff3cd", fill_type="solid")
-            fill_blue = PatternFill(start_color="d1ecf1", end_color="d1ecf1", fill_type="solid")
-
-            for rec in self.data:
-                row_data = [
-                    rec.get("name", ""),
-                    rec.get("address", ""),
-                    rec.get("area", ""),
-                    rec.get("rooms", ""),
-                    rec.get("visit_date", ""),
-                    rec.get("next_call_date", ""),
-                    rec.get("status", ""),
-                    rec.get("description", ""),
-                    rec.get("end_date", "")
-                ]
-                ws.append(row_data)
-
-                fill = None
-                status = rec.get("status", "")
-                if status == "از دست رفته":
-                    fill = fill_red
-                elif status == "خرید":
-                    fill = fill_green
-                elif status == "انتظار":
-                    fill = fill_yellow
-                elif status == "در انتظار تماس مجدد":
-                    fill = fill_blue
-
-                if fill:
-                    for cell in ws[ws.max_row]:
-                        cell.fill = fill
-
-            for col_idx, column in enumerate(ws.columns, 1):
-                max_length = 0
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = (max_length + 2)
-                ws.column_dimensions[get_column_letter(col_idx)].width = adjusted_width
-
-            wb.save(filepath)
-            messagebox.showinfo("موفق", f"فایل Excel با موفقیت در \n{filepath}\nذخیره شد.")
-            self.update_status_bar("فایل Excel با موفقیت ذخیره شد.")
-
-        except Exception as e:
-            messagebox.showerror("خطا", f"خطا در ایجاد فایل Excel: {str(e)}")
-            self.update_status_bar("خطا در ذخیره فایل Excel.")
-
-    def export_to_pdf(self):
-        """خروجی به فایل PDF"""
-        if not PDF_AVAILABLE:
-            messagebox.showerror("خطا", "کتابخانه reportlab نصب نیست.")
-            return
-
-        if not self.data:
-            messagebox.showinfo("اطلاع", "هیچ داده‌ای برای خروجی وجود ندارد.")
-            return
-
-        filepath = filedialog.asksaveasfilename(
-            defaultextension=".pdf",
-            filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")],
-            title="ذخیره فایل PDF"
-        )
-        if not filepath:
-            return
-
-        if not os.path.exists(PDF_FONT_PATH):
+        if fmt == "PDF" and not os.path.exists(PDF_FONT_PATH):
             messagebox.showerror("خطای فونت PDF",
                                  "فایل فونت فارسی برای PDF یافت نشد. "
                                  "لطفاً فایل Tanha.ttf را دانلود کرده و کنار برنامه قرار دهید."
@@ -916,117 +3355,316 @@ class ProjectManager:
             return
 
         try:
-            c = canvas.Canvas(filepath, pagesize=A4)
-            width, height = A4
-            margin = 2 * cm
-            y = height - margin
+            records = self.export_records()
+            if fmt == "PDF":
+                write_pdf_report(filepath, records, parallel=True)
+            else:
+                writer(filepath, records)
+            messagebox.showinfo("موفق", f"فایل {fmt} با موفقیت در \n{filepath}\nذخیره شد.")
+            self.update_status_bar(f"فایل {fmt} با موفقیت ذخیره شد.")
 
-            c.setFont(PDF_FONT_NAME, 16)
-            c.drawRightString(width - margin, y, "گزارش مدیریت پروژه‌ها")
-            y -= 1.5 * cm
+        except Exception as e:
+            messagebox.showerror("خطا", f"خطا در ایجاد فایل {fmt}: {str(e)}")
+            if "Cannot find TrueType font file" in str(e):
+                messagebox.showerror("خطای فونت PDF",
+                                     "فایل فونت فارسی برای PDF یافت نشد. "
+                                     "لطفاً فایل Tanha.ttf را دانلود کرده و کنار برنامه قرار دهید.")
+            self.update_status_bar(f"خطا در ذخیره فایل {fmt}.")
+
+    def export_records(self):
+        """
+        منبع خط لوله خروجی: نمای فعلی جدول (بدون پیمایش کل داده‌ها)، یا مجموعه کاری
+        و در صورت انتخاب «شامل بایگانی»، رکوردهای بایگانی (جریانی).
+        """
+        if self.export_scope_var.get() == "نمای فعلی":
+            return self.pager.iter_all() if self.pager is not None else self.view_records
+        if self.include_archive_var.get():
+            return itertools.chain(self.data, self.archive.iter_records())
+        return self.data
+
+    def export_scope_is_empty(self):
+        """آیا منبع خروجی انتخاب‌شده (export_records) هیچ رکوردی ندارد؟ بدون خواندن فایل‌های بایگانی."""
+        if self.export_scope_var.get() == "نمای فعلی":
+            return not (len(self.pager) if self.pager is not None else self.view_records)
+        return not self.data and not (self.include_archive_var.get() and self.archive.years())
+
+    def export_partitioned(self):
+        """خروجی جداگانه برای هر مهندس، وضعیت یا ماه شمسی"""
+        if self.export_scope_is_empty():
+            messagebox.showinfo("اطلاع", "هیچ داده‌ای برای خروجی وجود ندارد.")
+            return
 
-            c.setFont(PDF_FONT_NAME, 8)
-            current_greg_time = datetime.now()
-            current_shamsi_time = gregorian_datetime_to_shamsi_str(current_greg_time)
-            c.drawRightString(width - margin, y,
-                              f"تاریخ تولید: {current_shamsi_time} {current_greg_time.strftime('%H:%M')}")
-            y -= 2 * cm
+        win = tk.Toplevel(self.root)
+        win.title("خروجی تفکیکی")
+        win.resizable(False, False)
+
+        frame = ttk.Frame(win, padding="10")
+        frame.pack(fill="both", expand=True)
+
+        key_var = tk.StringVar(value="نام مهندس")
+        formats = [fmt for fmt, (_, _, available) in EXPORT_SINKS.items() if available]
+        fmt_var = tk.StringVar(value=formats[0])
+
+        row = ttk.Frame(frame)
+        row.pack(fill="x", pady=2)
+        key_combo = ttk.Combobox(row, textvariable=key_var, values=list(PARTITION_KEYS), width=15,
+                                 justify="right", state="readonly")
+        key_combo.pack(side="right", padx=5)
+        ttk.Label(row, text="تفکیک بر اساس:").pack(side="right", padx=5)
+        fmt_combo = ttk.Combobox(row, textvariable=fmt_var, values=formats, width=8,
+                                 justify="right", state="readonly")
+        fmt_combo.pack(side="right", padx=5)
+        ttk.Label(row, text="قالب:").pack(side="right", padx=(20, 5))
+
+        progress = ttk.Progressbar(frame, mode="determinate", length=350)
+        progress.pack(fill="x", pady=10)
+        progress_label = ttk.Label(frame, text="", anchor="center")
+        progress_label.pack(fill="x")
+
+        def start():
+            if fmt_var.get() == "PDF" and not os.path.exists(PDF_FONT_PATH):
+                messagebox.showerror("خطای فونت PDF",
+                                     "فایل فونت فارسی برای PDF یافت نشد. "
+                                     "لطفاً فایل Tanha.ttf را دانلود کرده و کنار برنامه قرار دهید.", parent=win)
+                return
+            out_dir = filedialog.askdirectory(title="انتخاب پوشه خروجی", parent=win)
+            if not out_dir:
+                return
+            # دامنه خروجی ممکن است پس از باز شدن این پنجره تغییر کرده باشد (مثلاً فیلتر بدون نتیجه)
+            records = list(self.export_records())
+            if not records:
+                messagebox.showinfo("اطلاع", "هیچ داده‌ای برای خروجی وجود ندارد.", parent=win)
+                return
+            start_button.config(state="disabled")
+            executor = ProcessPoolExecutor()
+            jobs = submit_partitioned_export(executor, records, key_var.get(), fmt_var.get(), out_dir)
+            progress.config(maximum=len(jobs), value=0)
+            self.poll_partitioned_export(win, executor, jobs, out_dir, progress, progress_label)
+
+        start_button = ttk.Button(frame, text="شروع", command=start, style="Success.TButton")
+        start_button.pack(side="right", padx=5, pady=(10, 0))
+        ttk.Button(frame, text="بستن", command=win.destroy).pack(side="left", padx=5, pady=(10, 0))
+
+    def poll_partitioned_export(self, win, executor, jobs, out_dir, progress, progress_label):
+        """بررسی دوره‌ای پیشرفت کارگرها بدون مسدود کردن رابط کاربری"""
+        done = sum(1 for _, future in jobs if future.done())
+        if win.winfo_exists():
+            progress.config(value=done)
+            progress_label.config(text=f"{done} از {len(jobs)} فایل")
+        self.update_status_bar(f"خروجی تفکیکی: {done} از {len(jobs)} فایل")
+
+        if done < len(jobs):
+            self.root.after(100, self.poll_partitioned_export, win, executor, jobs, out_dir, progress, progress_label)
+            return
 
-            c.setFont(PDF_FONT_NAME, 9)
-            headers = ["تاریخ پایان", "توضیحات", "وضعیت", "تماس بعدی", "تاریخ ویزیت", "اتاق", "متراژ", "آدرس",
-                       "نام مهندس"]
-            col_widths = [2.5 * cm, 4 * cm, 2.5 * cm, 2.5 * cm, 2.5 * cm, 1 * cm, 1.5 * cm, 4 * cm, 2.5 * cm]
+        executor.shutdown(wait=False)
+        written = []
+        failed = []
+        for filepath, future in jobs:
+            error = future.exception()
+            if error is None:
+                written.append(filepath)
+            else:
+                failed.append(f"{os.path.basename(filepath)}: {error}")
 
-            x_start = width - margin
-            current_x = x_start
-            for i, header in enumerate(headers):
-                text_width = pdfmetrics.stringWidth(header, PDF_FONT_NAME, 9)
-                current_x -= col_widths[i]
-                c.drawString(current_x + (col_widths[i] - text_width) / 2, y, header)
-            y -= 0.5 * cm
+        summary = f"{len(written)} فایل در \n{out_dir}\nذخیره شد."
+        if failed:
+            summary += f"\n\n{len(failed)} فایل با خطا مواجه شد:\n" + "\n".join(failed[:10])
+            messagebox.showwarning("خروجی تفکیکی", summary)
+        else:
+            messagebox.showinfo("موفق", summary)
+        self.update_status_bar(f"خروجی تفکیکی: {len(written)} فایل ذخیره شد.")
+        if win.winfo_exists():
+            win.destroy()
 
-            c.line(margin, y, width - margin, y)
-            y -= 0.5 * cm
 
-            c.setFont(PDF_FONT_NAME, 8)
-            row_height = 0.8 * cm
+# ---------- سنجش تاخیر رابط کاربری ----------
+UI_BENCH_SIZES = (500, 2000, 10000)
+UI_BENCH_REPEATS = 20
+UI_BENCH_BUDGET_MS = 250.0  # سقف p95 هر عملیات
+UI_BENCH_ENGINEERS = 97
 
-            for rec in self.data:
-                if y < margin + 2 * cm:
-                    c.showPage()
-                    c.setFont(PDF_FONT_NAME, 9)
-                    y = height - margin - 2 * cm
-                    current_x = x_start
-                    for i, header in enumerate(headers):
-                        text_width = pdfmetrics.stringWidth(header, PDF_FONT_NAME, 9)
-                        current_x -= col_widths[i]
-                        c.drawString(current_x + (col_widths[i] - text_width) / 2, y + 1.5 * cm, header)
-                    c.line(margin, y + 1 * cm, width - margin, y + 1 * cm)
-                    y -= 0.5 * cm
-                    c.setFont(PDF_FONT_NAME, 8)
-
-                status = rec.get("status", "")
-                fill_color = colors.white
-                if status == "از دست رفته":
-                    fill_color = colors.HexColor("#f8d7da")
-                elif status == "خرید":
-                    fill_color = colors.HexColor("#d4edda")
-                elif status == "انتظار":
-                    fill_color = colors.HexColor("#fff3cd")
-                elif status == "در انتظار تماس مجدد":
-                    fill_color = colors.HexColor("#d1ecf1")
-
-                c.setFillColor(fill_color)
-                c.rect(margin, y - 0.2 * cm, sum(col_widths), row_height, fill=1, stroke=0)
-                c.setFillColor(colors.black)
-
-                values_to_print = [
-                    rec.get("end_date", ""),
-                    rec.get("description", "")[:25] + "..." if len(rec.get("description", "")) > 25 else rec.get(
-                        "description", ""),
-                    rec.get("status", ""),
-                    rec.get("next_call_date", ""),
-                    rec.get("visit_date", ""),
-                    rec.get("rooms", ""),
-                    rec.get("area", ""),
-                    rec.get("address", "")[:25],
-                    rec.get("name", "")[:15]
-                ]
-
-                current_x = x_start
-                for i, value in enumerate(values_to_print):
-                    text_width = pdfmetrics.stringWidth(str(value), PDF_FONT_NAME, 8)
-                    current_x -= col_widths[i]
-                    c.drawString(current_x + (col_widths[i] - text_width) / 2, y, str(value))
-
-                y -= row_height
-
-            c.save()
-            messagebox.showinfo("موفق", f"فایل PDF با موفقیت در \n{filepath}\nذخیره شد.")
-            self.update_status_bar("فایل PDF با موفقیت ذخیره شد.")
 
-        except Exception as e:
-            messagebox.showerror("خطا", f"خطا در ایجاد فایل PDF: {str(e)}")
-            if "Cannot find TrueType font file" in str(e):
-                messagebox.showerror("خطای فونت PDF",
-                                     "فایل فونت فارسی برای PDF یافت نشد. "
-                                     "لطفاً فایل Tanha.ttf را دانلود کرده و کنار برنامه قرار دهید.")
-            self.update_status_bar("خطا در ذخیره فایل PDF.")
+def make_bench_records(count, seed=0):
+    """
+    داده آزمایشی قطعی برای سنجش. تاریخ‌های تماس در آینده‌اند تا پنجره یادآوری باز نشود
+    و تاریخ‌های پایان تازه‌اند تا چیزی بایگانی نشود.
+    """
+    rng = random.Random(seed)
+    today = date.today().toordinal()
+    records = []
+    for i in range(count):
+        finished = rng.random() < 0.3
+        records.append({
+            "name": f"مهندس {i % UI_BENCH_ENGINEERS}",
+            "address": f"خیابان {rng.randint(1, 300)} پلاک {i}",
+            "area": str(rng.randint(50, 400)),
+            "rooms": str(rng.randint(1, 6)),
+            "visit_date": ordinal_to_shamsi_str(today - rng.randint(0, 365)),
+            "next_call_date": "" if finished else ordinal_to_shamsi_str(today + rng.randint(1, 60)),
+            "status": rng.choice(FINISHED_STATUSES) if finished else "انتظار",
+            "description": "توضیحات " * rng.randint(1, 10),
+            "end_date": ordinal_to_shamsi_str(today - rng.randint(0, ARCHIVE_AFTER_DAYS - 1)) if finished else "",
+        })
+    return records
+
+
+def percentile(sorted_samples, fraction):
+    """صدک (نزدیک‌ترین رتبه) از نمونه‌های مرتب‌شده"""
+    index = min(len(sorted_samples) - 1, int(fraction * len(sorted_samples)))
+    return sorted_samples[index]
+
+
+def bench_dataset(size, repeats, budget_ms, out):
+    """سنجش یک اندازه داده در پوشه جاری؛ تعداد عملیات‌های بیش از بودجه را برمی‌گرداند."""
+    write_data_file(make_bench_records(size))
+    root = tk.Tk()
+    app = ProjectManager(root)
+    while not app.ready:
+        root.update()
+        time.sleep(0.001)
+
+    today_str = ordinal_to_shamsi_str(date.today().toordinal())
+    sort_choices = [(sort_by, order) for sort_by in ("تاریخ تماس بعدی", "تاریخ ویزیت", "نام مهندس", "وضعیت")
+                    for order in ("صعودی", "نزولی")]
+
+    def submit(i):
+        app.clear_fields()
+        app.entries["name"].insert(0, "مهندس سنجش")
+        app.entries["address"].insert(0, f"آدرس سنجش {i}")
+        app.entries["visit_date"].insert(0, today_str)
+        app.entries["description"].insert("1.0", "ثبت شده توسط سنجش")
+        app.add_or_update_entry()
+
+    def apply_filter(i):
+        app.filter_name_var.set(f"مهندس {i % UI_BENCH_ENGINEERS}")
+        app.apply_filter_sort()
+
+    def change_sort(i):
+        sort_by, order = sort_choices[i % len(sort_choices)]
+        app.sort_by_var.set(sort_by)
+        app.sort_order_var.set(order)
+        app.apply_filter_sort()
+
+    def delete(i):
+        key = ("مهندس سنجش", f"آدرس سنجش {i}")
+        rec = next((rec for rec in reversed(app.data) if record_key(rec) == key), None)
+        item_id = app._item_by_rec.get(id(rec))
+        if item_id is not None:
+            app.delete_item(item_id)
+
+    # رکورد ثبت‌شده در هر دور در همان دور حذف می‌شود تا اندازه داده ثابت بماند
+    operations = [
+        ("ثبت فرم", submit),
+        ("فیلتر", apply_filter),
+        ("پاک کردن فیلتر", lambda i: app.clear_filters()),
+        ("مرتب‌سازی", change_sort),
+        # toggle_theme در حالت روشن فقط پیام «غیرفعال» نشان می‌دهد؛ مسیر بازرنگ‌آمیزی خود apply_theme است
+        ("تغییر تم", lambda i: app.apply_theme(app.current_theme)),
+        ("حذف", delete),
+    ]
+    samples = {name: [] for name, _ in operations}
+    try:
+        for i in range(repeats):
+            for name, operation in operations:
+                # تاخیر از فراخوانی رویداد تا خالی شدن صف رویدادها و کارهای بیکاری Tk
+                start = time.perf_counter()
+                operation(i)
+                root.update()
+                samples[name].append((time.perf_counter() - start) * 1000)
+    finally:
+        app.on_close()
+
+    over_budget = 0
+    for name, values in samples.items():
+        values.sort()
+        p50 = percentile(values, 0.50)
+        p95 = percentile(values, 0.95)
+        failed = p95 > budget_ms
+        over_budget += failed
+        print(f"{size:>8}  {name:<16}  p50={p50:8.1f}ms  p95={p95:8.1f}ms{'  FAIL' if failed else ''}", file=out)
+    return over_budget
+
+
+def run_ui_benchmark(sizes=UI_BENCH_SIZES, repeats=UI_BENCH_REPEATS, budget_ms=UI_BENCH_BUDGET_MS, out=None):
+    """
+    اجرای یک ProjectManager واقعی (روی سرور بدون نمایشگر با xvfb-run) و اندازه‌گیری p50/p95
+    ثبت فرم، فیلتر، مرتب‌سازی، تغییر تم و حذف برای هر اندازه داده.
+    هر اندازه در یک پوشه موقت اجرا می‌شود تا فایل‌های داده و تنظیمات کاربر دست نخورند.
+    تعداد عملیات‌هایی که p95 آن‌ها از بودجه بیشتر است برمی‌گرداند.
+    """
+    global PDF_FONT_WARNING
+    out = out or sys.stdout
+    print(f"بودجه p95: {budget_ms:.0f}ms، تکرار: {repeats}", file=out)
+    over_budget = 0
+    workdir = os.getcwd()
+    font_path = os.path.join(workdir, PDF_FONT_PATH)
+    has_font = os.path.exists(font_path)
+    if not has_font:
+        # هشدار مودال فونت تا بسته شدن دستی پنجره، سنجش را متوقف می‌کرد
+        print(f"فایل فونت PDF ({PDF_FONT_PATH}) یافت نشد؛ هشدار آن در سنجش نمایش داده نمی‌شود.", file=out)
+    PDF_FONT_WARNING = False
+    try:
+        for size in sizes:
+            with tempfile.TemporaryDirectory() as tmp:
+                if has_font:
+                    shutil.copy(font_path, tmp)
+                os.chdir(tmp)
+                try:
+                    over_budget += bench_dataset(size, repeats, budget_ms, out)
+                except tk.TclError as e:
+                    print(f"اجرای رابط گرافیکی ممکن نیست (نمایشگر در دسترس است؟): {e}", file=out)
+                    return over_budget + 1
+                finally:
+                    os.chdir(workdir)
+    finally:
+        PDF_FONT_WARNING = True
+    return over_budget
 
 
 def main():
     """تابع اصلی برنامه"""
+    multiprocessing.freeze_support()  # برای ProcessPoolExecutor در فایل exe
+    parser = argparse.ArgumentParser(description="مدیریت پروژه‌ها")
+    parser.add_argument("--due", action="store_true",
+                        help="چاپ تماس‌های سررسید امروز بدون رابط گرافیکی")
+    parser.add_argument("--check-dates", action="store_true",
+                        help="مقایسه کدگذار تاریخ شمسی با jdatetime و اندازه‌گیری سرعت")
+    parser.add_argument("--bench-ui", action="store_true",
+                        help="سنجش تاخیر عملیات رابط کاربری (زیر Xvfb: xvfb-run python 16.py --bench-ui)")
+    parser.add_argument("--bench-sizes", default=",".join(map(str, UI_BENCH_SIZES)),
+                        help="اندازه‌های داده برای سنجش، جدا شده با کاما")
+    parser.add_argument("--bench-repeats", type=int, default=UI_BENCH_REPEATS,
+                        help="تعداد تکرار هر عملیات در سنجش")
+    parser.add_argument("--budget-ms", type=float, default=UI_BENCH_BUDGET_MS,
+                        help="سقف مجاز p95 هر عملیات بر حسب میلی‌ثانیه")
+    parser.add_argument("--backups", action="store_true",
+                        help="فهرست نسخه‌های پشتیبان آخرین مجموعه داده")
+    parser.add_argument("--restore", metavar="STAMP",
+                        help="بازیابی آخرین مجموعه داده به نسخه پشتیبان STAMP (از خروجی --backups)")
+    args = parser.parse_args()
+
+    if args.bench_ui:
+        sizes = [int(size) for size in args.bench_sizes.split(",") if size.strip()]
+        sys.exit(1 if run_ui_benchmark(sizes, args.bench_repeats, args.budget_ms) else 0)
+    if args.due:
+        sys.exit(print_due_report())
+    if args.backups:
+        sys.exit(print_backups())
+    if args.restore:
+        sys.exit(restore_backup(args.restore))
+    if args.check_dates:
+        sys.exit(1 if check_jalali_codec() else 0)
+
     root = tk.Tk()
     app = ProjectManager(root)
 
-    root.protocol("WM_DELETE_WINDOW", lambda: (save_data(app.data), save_config(app.config), root.destroy()))
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
 
     try:
         root.mainloop()
     except KeyboardInterrupt:
-        save_data(app.data)
-        save_config(app.config)
-        root.destroy()
+        app.on_close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,29 @@
+import importlib
+import os
+import shutil
+import sys
+import tkinter as tk
+
+import pytest
+
+APP_SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "16.py")
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """16.py imported under an importable name, so spawned worker processes can unpickle its functions."""
+    module_dir = tmp_path_factory.mktemp("app")
+    shutil.copy(APP_SOURCE, module_dir / "project_manager.py")
+    sys.path.insert(0, str(module_dir))
+    try:
+        yield importlib.import_module("project_manager")
+    finally:
+        sys.path.remove(str(module_dir))
+
+
+@pytest.fixture
+def tk_root():
+    try:
+        return tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display (run under xvfb-run)")
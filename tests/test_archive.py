@@ -0,0 +1,35 @@
+def make_store(app, tmp_path):
+    return app.ArchiveStore(str(tmp_path / "archive"), app.BlobStore(str(tmp_path / "descriptions.blob")))
+
+
+def finished(app, description, end_date="1400/05/01"):
+    return {"name": "مهندس", "address": "آدرس", "status": "خرید", "end_date": end_date,
+            "visit_date": "1400/01/01", "description": description}
+
+
+def test_exact_key_duplicates_are_all_archived(app, tmp_path):
+    store = make_store(app, tmp_path)
+    store.archive([finished(app, "اول"), finished(app, "دوم")])
+    assert sorted(rec["description"] for rec in store.iter_records()) == ["اول", "دوم"]
+
+
+def test_rearchiving_the_same_record_does_not_duplicate_it(app, tmp_path):
+    store = make_store(app, tmp_path)
+    store.archive([finished(app, "اول"), finished(app, "دوم")])
+    store.archive([finished(app, "اول")])
+    assert sorted(rec["description"] for rec in store.iter_records()) == ["اول", "دوم"]
+
+
+def test_remove_takes_only_the_matching_duplicate(app, tmp_path):
+    store = make_store(app, tmp_path)
+    store.archive([finished(app, "اول"), finished(app, "دوم")])
+    removed = store.remove(("مهندس", "آدرس"), payload=finished(app, "دوم"))
+    assert removed["description"] == "دوم"
+    assert [rec["description"] for rec in store.iter_records()] == ["اول"]
+
+
+def test_persian_and_latin_digit_years_share_one_file(app, tmp_path):
+    store = make_store(app, tmp_path)
+    store.archive([finished(app, "اول", "1400/05/01"), finished(app, "دوم", "۱۴۰۰/۰۶/۰۱")])
+    assert store.years() == ["1400"]
+    assert len(store.load_year("1400")) == 2
@@ -0,0 +1,29 @@
+import time
+
+
+def backup_kinds(workspace):
+    return [kind for _, kind in workspace.backups.points()]
+
+
+def test_launches_without_edits_do_not_write_full_snapshots(app, tmp_path):
+    path = str(tmp_path / "x.json")
+    app.write_data_file([{"name": "مهندس", "address": "آدرس", "visit_date": "1402/01/01"}], path)
+    for _ in range(4):
+        workspace = app.load_workspace(path)
+        time.sleep(0.01)
+        workspace.flush()
+        workspace.close()
+    assert backup_kinds(workspace) == ["full"]
+
+
+def test_flush_saves_and_backs_up_pending_changes(app, tmp_path):
+    path = str(tmp_path / "x.json")
+    app.write_data_file([{"name": "مهندس", "address": "آدرس", "visit_date": "1402/01/01"}], path)
+    workspace = app.load_workspace(path)
+    workspace.data[0]["status"] = "در انتظار تماس مجدد"
+    workspace.mark_changed(workspace.data[0])
+    workspace.flush()
+    workspace.close()
+    assert app.read_data_file(path)[0]["status"] == "در انتظار تماس مجدد"
+    assert backup_kinds(workspace) == ["full", "delta"]
+    assert app.load_workspace(path).backups.points() == workspace.backups.points()
@@ -0,0 +1,22 @@
+def rec(**fields):
+    return {"name": "مهندس", "address": "آدرس", "visit_date": "1402/01/01", **fields}
+
+
+def test_open_keeper_does_not_take_end_date_of_finished_duplicate(app):
+    values = app.merged_fields([rec(status="انتظار"), rec(status="خرید", end_date="1402/02/01")])
+    assert "status" not in values and "end_date" not in values
+
+
+def test_keeper_without_status_takes_status_and_end_date_together(app):
+    values = app.merged_fields([rec(), rec(status="انتظار", end_date="1402/02/01"),
+                                rec(status="خرید", end_date="1402/03/01")])
+    assert values.get("status") == "انتظار" and "end_date" not in values
+
+    values = app.merged_fields([rec(), rec(status="از دست رفته", end_date="1402/03/01")])
+    assert (values["status"], values["end_date"]) == ("از دست رفته", "1402/03/01")
+
+
+def test_finished_keeper_fills_missing_end_date_from_finished_duplicate(app):
+    values = app.merged_fields([rec(status="خرید"), rec(status="انتظار", end_date="1402/02/01"),
+                                rec(status="خرید", end_date="1402/03/01")])
+    assert values == {"end_date": "1402/03/01"}
@@ -0,0 +1,37 @@
+import pytest
+
+
+def make_records():
+    records = [{"name": f"مهندس {i}", "address": "آدرس", "visit_date": f"1402/01/{i + 1:02d}"} for i in range(6)]
+    # three exact duplicates: same sort value and same (name, address)
+    records += [{"name": "مهندس تکراری", "address": "آدرس", "visit_date": "1402/01/03"} for _ in range(3)]
+    return records
+
+
+def walk(pager, forward):
+    page = pager.first_page() if forward else pager.last_page()
+    seen = []
+    while page:
+        seen.extend(page if forward else reversed(page))
+        page = pager.next_page() if forward else pager.prev_page()
+    return seen
+
+
+@pytest.mark.parametrize("page_size", [2, 3, 4])
+@pytest.mark.parametrize("reverse", [False, True])
+def test_paging_visits_every_row_once(app, page_size, reverse):
+    records = make_records()
+    pager = app.KeysetPager(records, lambda rec: rec["visit_date"], reverse=reverse, page_size=page_size)
+    for forward in (True, False):
+        seen = walk(pager, forward)
+        assert sorted(map(id, seen)) == sorted(map(id, records))
+
+
+def test_add_and_discard_keep_duplicates_apart(app):
+    records = make_records()
+    pager = app.KeysetPager(records, lambda rec: rec["visit_date"], page_size=4)
+    extra = dict(records[-1])
+    pager.add(extra)
+    pager.discard(records[-1])
+    seen = walk(pager, True)
+    assert sorted(map(id, seen)) == sorted(map(id, records[:-1] + [extra]))
@@ -0,0 +1,46 @@
+import time
+from datetime import date
+
+
+def test_undoing_a_merge_of_exact_key_duplicates_restores_both_rows(app, tk_root, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(app, "PDF_FONT_WARNING", False)
+    today = date.today().toordinal()
+
+    def record(area, days, description):
+        return {"name": "مهندس آزمون", "address": "آدرس یکسان", "area": area, "rooms": "",
+                "visit_date": app.ordinal_to_shamsi_str(today),
+                "next_call_date": app.ordinal_to_shamsi_str(today + days),
+                "status": "", "description": description, "end_date": ""}
+
+    other = dict(record("300", 7, ""), name="مهندس دیگر", address="آدرس دیگر")
+    app.write_data_file([record("100", 3, "اول"), record("200", 5, "دوم"), other])
+
+    pm = app.ProjectManager(tk_root)
+    while not pm.ready:
+        tk_root.update()
+        time.sleep(0.001)
+    try:
+        def fields(rec):
+            return rec.get("area"), rec.get("next_call_date"), app.load_description(rec)
+
+        first, second = pm.data[0], pm.data[1]
+        before = [fields(first), fields(second)]
+        assert pm.merge_clusters([[first, second]]) == 1
+        assert len(pm.data) == 2
+
+        pm.undo()
+        tk_root.update()
+
+        assert pm.data[0] is first and pm.data[1] is second
+        assert [fields(first), fields(second)] == before
+        assert len(pm.tree.get_children()) == 3
+        for rec in (first, second):
+            item_id = pm._item_by_rec[id(rec)]
+            assert tuple(map(str, pm.tree.item(item_id, "values"))) == tuple(map(str, app.tree_row_values(rec)))
+        assert len(pm.reminders) == 3
+        assert sorted(rec["area"] for rec in app.read_data_file()) == ["100", "200", "300"]
+        stamp = pm.workspace.backups.points()[-1][0]
+        assert sorted(rec["area"] for rec in pm.workspace.backups.restore(stamp)) == ["100", "200", "300"]
+    finally:
+        pm.on_close()
@@ -0,0 +1,32 @@
+import csv
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def test_spawned_workers_export_descriptions_of_non_default_workspace(app, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # the module-default blob in the working directory holds unrelated text at the same offset
+    app.BlobStore(app.DESCRIPTION_BLOB_FILE).append("x" * 500)
+
+    (tmp_path / "other").mkdir()
+    workspace = app.Workspace(str(tmp_path / "other" / "x.json"))
+    description = "توضیحات طولانی مجموعه دیگر " * 20
+    rec = {"name": "مهندس", "address": "آدرس", "visit_date": "1402/01/01", "description": description}
+    assert app.externalize_description(rec, workspace.descriptions)
+
+    app.set_active_descriptions(workspace.descriptions)
+    try:
+        out_dir = tmp_path / "out"
+        out_dir.mkdir()
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            jobs = app.submit_partitioned_export(executor, [rec], "نام مهندس", "CSV", str(out_dir))
+            paths = [future.result() for _, future in jobs]
+    finally:
+        app.set_active_descriptions(app.BlobStore())
+        workspace.close()
+
+    with open(paths[0], encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.reader(f))
+    column = [field for field, _ in app.EXPORT_COLUMNS].index("description")
+    assert rows[1][column] == description
+    assert "description_ref" in rec  # the record in the workspace is left untouched
@@ -0,0 +1,44 @@
+import hashlib
+import shutil
+from datetime import datetime
+
+import pytest
+
+SYSTEM_FONT = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+
+
+@pytest.fixture
+def pdf_dir(app, tmp_path, monkeypatch):
+    if not (app.PDF_AVAILABLE and app.PDF_MERGE_AVAILABLE):
+        pytest.skip("reportlab and pypdf are required")
+    font = tmp_path / app.PDF_FONT_PATH
+    try:
+        shutil.copy(SYSTEM_FONT, font)
+    except OSError:
+        pytest.skip("no TrueType font to stand in for Tanha.ttf")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(app, "PDF_PAGES_PER_CHUNK", 2)
+    return tmp_path
+
+
+def digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_parallel_pdf_does_not_depend_on_cpu_count(app, pdf_dir, monkeypatch):
+    records = [{"name": f"مهندس {i}", "address": f"آدرس {i}", "visit_date": "1402/01/01",
+                "status": "انتظار", "description": "توضیحات"} for i in range(150)]
+    generated_at = datetime(2023, 3, 21, 10, 30)
+    digests = set()
+    for cpus in (2, 4):
+        monkeypatch.setattr(app.os, "cpu_count", lambda: cpus)
+        path = str(pdf_dir / f"report_{cpus}.pdf")
+        app.write_pdf_report(path, records, generated_at=generated_at, parallel=True)
+        digests.add(digest(path))
+    assert len(digests) == 1
+
+    serial = [str(pdf_dir / f"serial_{i}.pdf") for i in range(2)]
+    for path in serial:
+        app.write_pdf_report(path, records, generated_at=generated_at)
+    assert digest(serial[0]) == digest(serial[1])
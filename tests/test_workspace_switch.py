@@ -0,0 +1,34 @@
+import time
+
+import pytest
+
+
+def wait_ready(root, pm):
+    while not pm.ready:
+        root.update()
+        time.sleep(0.001)
+
+
+def test_switching_back_to_a_cached_workspace_reuses_its_table(app, tk_root, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(app, "PDF_FONT_WARNING", False)
+    rows = [{"name": f"مهندس {i}", "address": "آدرس", "visit_date": "1402/01/01"} for i in range(30)]
+    app.write_data_file(rows)
+    other = str(tmp_path / "other.json")
+    app.write_data_file(rows[:5], other)
+
+    pm = app.ProjectManager(tk_root)
+    wait_ready(tk_root, pm)
+    try:
+        first_tree = pm.tree
+        pm.switch_workspace(other)
+        wait_ready(tk_root, pm)
+        assert pm.tree is not first_tree and len(pm.tree.get_children()) == 5
+
+        monkeypatch.setattr(pm, "render_rows_chunked",
+                            lambda *args: pytest.fail("cached workspace was rendered row by row again"))
+        pm.switch_workspace(app.DATA_FILE)
+        wait_ready(tk_root, pm)
+        assert pm.tree is first_tree and len(pm.tree.get_children()) == 30
+    finally:
+        pm.on_close()